@@ -0,0 +1,203 @@
+"""
+Host side benchmarks for rgbmatrix_coopmt
+====================================================
+
+Runs the driver against the SimulatedPanel backend and reports the wall time and the pin
+operations (pin writes, level changes and clock pulses) of the refresh path and the drawing
+primitives for several panel sizes and workloads. The results are written as JSON so runs of
+different releases can be compared.
+
+Run from the repository root with CPython:
+
+    python benchmarks/benchmark.py [--quick] [--panels 64x32,64x64] [--output results.json]
+
+Wall times include the overhead of the simulated panel, the pin operation counts are what
+the driver would perform on real hardware.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import rgbmatrix_coopmt
+
+# name: (rows, cols), chained panels simply form a longer shift register
+PANELS = {
+    '32x32': (32,32),
+    '64x32': (32,64),
+    '64x64': (64,64),
+    '2x64x32': (32,128),
+}
+
+RGBPINS = ["R1","G1","B1","R2","G2","B2"]
+
+# 3x5 digits for the static text workload, one string of 15 pixels per glyph
+DIGITS = {
+    '0': '111101101101111', '1': '010110010010111', '2': '111001111100111',
+    '3': '111001111001111', '4': '101101111001001', '5': '111100111001111',
+    '6': '111100111101111', '7': '111001001001001', '8': '111101111101111',
+    '9': '111101111001111', ':': '000010000010000',
+}
+
+def make_matrix(rows,cols):
+    panel = rgbmatrix_coopmt.SimulatedPanel(rows,cols)
+    addrPins = ["A","B","C","D","E","F"][:len(bin(rows))-4]
+    matrix = rgbmatrix_coopmt.RGBMatrix(rows,cols,addrPins,RGBPINS,"CLK","LAT","OE",backend=panel)
+    return matrix,panel
+
+def measure(panel,func,repeat,setup=None):
+    wall = 0
+    writes = 0
+    toggles = 0
+    clocks = 0
+    for i in range(repeat):
+        if setup is not None:
+            setup(i)
+        panel.reset_counters()
+        start = time.perf_counter()
+        func(i)
+        wall += time.perf_counter() - start
+        writes += panel.writes
+        toggles += sum(panel.toggles().values())
+        clocks += panel.clocks
+    return {
+        'repeat': repeat,
+        'wall_us': round(wall / repeat * 1000000,1),
+        'pin_writes': round(writes / repeat,1),
+        'pin_toggles': round(toggles / repeat,1),
+        'clocks': round(clocks / repeat,1),
+    }
+
+def draw_text(matrix,text,row,col,color):
+    for char in text:
+        glyph = DIGITS[char]
+        for i in range(15):
+            if glyph[i] == '1':
+                matrix.point(row + i // 3,col + i % 3,color)
+        col += 4
+
+def spin_line(matrix,step):
+    angle = (step * 20) % 360 * math.pi / 180
+    radius = min(matrix.rows,matrix.cols) // 3
+    rowcent = matrix.rows // 2
+    colcent = matrix.cols // 2
+    row1 = int(radius * math.cos(angle)) + rowcent
+    col1 = int(radius * math.sin(angle)) + colcent
+    row2 = int(radius * math.cos(angle + math.pi)) + rowcent
+    col2 = int(radius * math.sin(angle + math.pi)) + colcent
+    return row1,col1,row2,col2
+
+def primitive_benchmarks(matrix,panel,repeat):
+    results = {}
+    rows = matrix.rows
+    cols = matrix.cols
+    rand = random.Random(1)
+
+    def random_image(i):
+        matrix.fill(0)
+        for j in range(20):
+            matrix.line(rand.randrange(rows),rand.randrange(cols),rand.randrange(rows),rand.randrange(cols),
+                rand.randrange(1,8))
+        matrix.refresh()
+
+    results['refresh_optimize'] = measure(panel,lambda i: matrix.refresh(True),repeat,random_image)
+    results['refresh_no_optimize'] = measure(panel,lambda i: matrix.refresh(False),repeat,random_image)
+    results['sendrow'] = measure(panel,lambda i: matrix.sendrow(i % rows),repeat)
+    results['fill'] = measure(panel,lambda i: matrix.fill(i % 7 + 1),repeat)
+    results['fill_replace'] = measure(panel,lambda i: matrix.fill(3,1,True),repeat,random_image)
+
+    def outline(i):
+        matrix.fill(0)
+        matrix.polygon([[1,1],[1,cols-2],[rows-2,cols-2],[rows-2,1]],1)
+
+    results['fillarea'] = measure(panel,lambda i: matrix.fillarea(rows//2,cols//2,2),max(1,repeat//5),outline)
+    results['line'] = measure(panel,
+        lambda i: matrix.line(rand.randrange(rows),rand.randrange(cols),rand.randrange(rows),rand.randrange(cols),i%8),
+        repeat)
+    results['circle'] = measure(panel,
+        lambda i: matrix.circle(rows//2,cols//2,min(rows,cols)//2 - 1 - i % 4,i % 8),repeat)
+    results['polygon'] = measure(panel,
+        lambda i: matrix.polygon([[0,0],[rows-1,cols//2],[rows//2,cols-1],[rows//3,cols//4]],i % 8),repeat)
+    return results
+
+def workload_benchmarks(matrix,panel,repeat):
+    results = {}
+    rows = matrix.rows
+    cols = matrix.cols
+
+    # Static text: the image never changes, only the refresh matters
+    matrix.fill(0)
+    draw_text(matrix,'12:34',1,1,2)
+    draw_text(matrix,'56:78',rows//2,1,4)
+    matrix.refresh()
+    results['static_text'] = measure(panel,lambda i: matrix.refresh(True),repeat)
+
+    # Spin animation from examples/spin.py: erase the old line, draw the new one, refresh
+    matrix.fill(0)
+    last = [spin_line(matrix,0)]
+
+    def spin(i):
+        matrix.line(*last[0],0)
+        last[0] = spin_line(matrix,i+1)
+        matrix.line(*last[0],i % 7 + 1)
+        matrix.refresh(True)
+
+    results['spin_frame'] = measure(panel,spin,repeat)
+
+    # Random lines from examples/adafruit_gfx_randlines.py
+    rand = random.Random(2)
+    matrix.fill(0)
+
+    def randlines(i):
+        matrix.line(rand.randrange(rows),rand.randrange(cols),rand.randrange(rows),rand.randrange(cols),
+            rand.randrange(8))
+        matrix.refresh(True)
+
+    results['random_lines_frame'] = measure(panel,randlines,repeat)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark rgbmatrix_coopmt on a simulated panel')
+    parser.add_argument('--panels',default=','.join(PANELS),
+        help='comma separated panel sizes to run (default: %(default)s)')
+    parser.add_argument('--repeat',type=int,default=20,help='repetitions per benchmark (default: %(default)s)')
+    parser.add_argument('--quick',action='store_true',help='run each benchmark only a few times')
+    parser.add_argument('--output',help='write the JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    repeat = 3 if args.quick else args.repeat
+    report = {
+        'library_version': rgbmatrix_coopmt.__version__,
+        'python': platform.python_implementation() + ' ' + platform.python_version(),
+        'machine': platform.machine(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': repeat,
+        'results': [],
+    }
+
+    for name in args.panels.split(','):
+        rows,cols = PANELS[name]
+        matrix,panel = make_matrix(rows,cols)
+        for group,benchmarks in (('primitive',primitive_benchmarks),('workload',workload_benchmarks)):
+            for benchmark,result in benchmarks(matrix,panel,repeat).items():
+                result.update({'panel': name,'rows': rows,'cols': cols,'group': group,'benchmark': benchmark})
+                report['results'].append(result)
+                print(f'{name:>8} {benchmark:<20} {result["wall_us"]:>12.1f} us {result["pin_writes"]:>10.0f} writes',
+                    file=sys.stderr)
+        matrix.deinit()
+
+    output = json.dumps(report,indent=1)
+    if args.output:
+        with open(args.output,'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
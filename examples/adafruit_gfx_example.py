@@ -46,8 +46,10 @@ rows = 2 ** (len(addrPins)+1)
 display = rgbmatrix_coopmt.RGBMatrix(rows,64,addrPins,rgbPins,clockPin,latchPin,OEPin,unused_rgbPins)
 
 # Initialize the GFX library, giving it the display pixel function as its pixel
-# drawing primitive command.
-graphics = adafruit_gfx.gfx.GFX(display.rows,display.cols,display.point)
+# drawing primitive command along with the display's faster line and rectangle spans.
+# GFX's x coordinate is the display row, so its horizontal line is the display's vline.
+graphics = adafruit_gfx.gfx.GFX(display.rows,display.cols,display.point,
+    hline=display.vline,vline=display.hline,fill_rect=display.fill_rect)
 
 # Set to True to reduce flicker especially on slower driver boards
 optimize = False
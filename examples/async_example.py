@@ -0,0 +1,75 @@
+from sys import implementation
+import rgbmatrix_coopmt
+try:
+    import asyncio
+except:
+    import uasyncio as asyncio
+
+rgbPins = []
+if implementation.name.upper() == "CIRCUITPYTHON":
+    import board
+    if hasattr(board,'MTX_ADDRA'):
+        addrPins = ["MTX_ADDRA","MTX_ADDRB","MTX_ADDRC","MTX_ADDRD"]
+
+        rgbPins=["MTX_R1","MTX_G1","MTX_B1","MTX_R2","MTX_G2","MTX_B2"]
+        unused_rgbPins = None
+        clockPin = "MTX_CLK"
+        latchPin = "MTX_LAT"
+        OEPin ="MTX_OE"
+
+# Teensy 4/4.1 pins or MicroPython
+if rgbPins == []:
+    addrPins = ["D21","D4","D20","D5","D3"]
+    rgbPins=["D16","D1","D17","D23","D2","D22"]
+    clockPin = "D19"
+    latchPin = "D6"
+    OEPin ="D18"
+    unused_rgbPins = None
+# RPi Zero2w
+#    addrPins = ["D27","D25","D9","D24","D8"]
+#    rgbPins=["D4","D1","D3","D2","D7","D17"]
+#    clockPin = "D11"
+#    latchPin = "D23"
+#    OEPin ="D10"
+#    unused_rgbPins = None
+
+rows = 2 ** (len(addrPins)+1)
+matrix = rgbmatrix_coopmt.RGBMatrix(rows,64,addrPins,rgbPins,clockPin,latchPin,OEPin,unused_rgbPins)
+
+async def bounce():
+    # Moves a dot around the screen while the display task keeps the panel refreshed
+    row = 0
+    col = 0
+    drow = 1
+    dcol = 1
+    while True:
+        matrix.point(row,col,0)
+        if not 0 <= row+drow < matrix.rows:
+            drow = -drow
+        if not 0 <= col+dcol < matrix.cols:
+            dcol = -dcol
+        row += drow
+        col += dcol
+        matrix.point(row,col,2)
+        await matrix.sleep_async(.05)
+
+async def commands():
+    while True:
+        ans = await matrix.input_async('[c] circle, [f] clear, [q] quit: ')
+        if ans in ['c','C']:
+            matrix.circle(matrix.rows//2,matrix.cols//2,min(matrix.rows,matrix.cols)//3,4)
+        elif ans in ['f','F']:
+            matrix.fill(0)
+        elif ans in ['q','Q']:
+            matrix.stop()
+            return
+
+async def main():
+    display = asyncio.create_task(matrix.run(refresh_hz=120))
+    dot = asyncio.create_task(bounce())
+    await commands()
+    dot.cancel()
+    await display
+    matrix.deinit()
+
+asyncio.run(main())
@@ -55,8 +55,10 @@ while True:
         row2 = int(radius*math.cos(((i+180)%360)*math.pi/180)) + rowcent
         col2 = int(radius*math.sin(((i+180)%360)*math.pi/180)) + colcent
 
-        matrix.line(or1,oc1,or2,oc2,0)
-        matrix.line(row1,col1,row2,col2,color)
+        # Draw off-screen and swap so the erase/redraw is never displayed half done
+        matrix.begin_frame()
+        matrix.lines(((or1,oc1,or2,oc2,0),(row1,col1,row2,col2,color)))
+        matrix.swap()
         matrix.sleep(.05)
         if matrix.serial_bytes_available():
             matrix.input(None,True)
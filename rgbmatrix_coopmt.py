@@ -12,17 +12,1004 @@ try:
     import digitalio
     import board
 except:
-    from machine import Pin
-    
+    try:
+        from machine import Pin
+    except:
+        pass    # host side, only the SimulatedPanel backend is available
+
 import math
+import struct
+from array import array
 try:
     import adafruit_ticks
 except:
     import time as adafruit_ticks
+try:
+    import asyncio
+except:
+    try:
+        import uasyncio as asyncio
+    except:
+        asyncio = None
+try:
+    import _thread
+except:
+    _thread = None
+try:
+    import numpy
+except:
+    numpy = None
+try:
+    from collections import OrderedDict
+except:
+    from ucollections import OrderedDict
+try:
+    from time import ticks_us as _ticks_us, ticks_diff as _ticks_diff
+except:
+    from time import monotonic_ns
+
+    def _ticks_us():
+        return monotonic_ns() // 1000
+
+    def _ticks_diff(end,start):
+        return end - start
+try:
+    from time import sleep_ms
+
+    def _yieldthread():
+        sleep_ms(1)
+except:
+    from time import sleep
+
+    def _yieldthread():
+        # Lets the other thread run instead of spinning against it for the interpreter lock
+        sleep(0)
+
+# Dirty row flags, one bit for each consumer of framebuffer changes
+_DIRTY_USER = 1         # reported by RGBMatrix.dirty_rows()
+_DIRTY_STREAM = 2       # scan row pin-state streams
+_DIRTY_ALL = 0xff
+
+# 4x4 Bayer matrix, offsets the temporal dithering cycle of neighbouring pixels
+_BAYER4 = (0,8,2,10,12,4,14,6,3,11,1,9,15,7,13,5)
 
 __version__ = "0.1.0+auto.0"
 __repo__ = "https://github.com/retiredwizard/RGBMatrixDisp.git"
 
+class CircuitPythonPins:
+    """
+    Pin backend using the CircuitPython (or Blinka) digitalio and board modules.
+
+    Every backend provides the same small set of operations which RGBMatrix uses to drive the
+    panel: setup(), shift(), latch(), address(), enable() and deinit(). The shift() method is
+    passed a precomputed stream of RGB pin states, one byte per clock with bit i holding the
+    state of rgbPins[i].
+    """
+
+    def setup(self,addrPins,rgbPins,clockPin,latchPin,OEPin,unused_rgbPins=None):
+        self._clockIO = self._output(clockPin)
+        self._latchIO = self._output(latchPin)
+        self._OEIO = self._output(OEPin)
+        self._addrIO = [self._output(pin) for pin in addrPins]
+        self._rgbIO = [self._output(pin) for pin in rgbPins]
+        self._unused_rgbIO = []
+        if unused_rgbPins != None:
+            self._unused_rgbIO = [self._output(pin) for pin in unused_rgbPins]
+        self._numRGB = len(self._rgbIO) // 2
+
+    def _output(self,pin):
+        io = digitalio.DigitalInOut(getattr(board,pin))
+        io.direction = digitalio.Direction.OUTPUT
+        io.value = False
+        return io
+
+    def shift(self,stream):
+        # Each byte of stream holds the RGB pin states for one clock, bit i is rgbPins[i]
+        rgbIO = self._rgbIO
+        clockIO = self._clockIO
+        if len(rgbIO) == 6:
+            r1,g1,b1,r2,g2,b2 = rgbIO
+            for bits in stream:
+                r1.value = bits & 1
+                g1.value = bits & 2
+                b1.value = bits & 4
+                r2.value = bits & 8
+                g2.value = bits & 16
+                b2.value = bits & 32
+                clockIO.value = True
+                clockIO.value = False
+        elif len(rgbIO) == 4:
+            r1,g1,r2,g2 = rgbIO
+            for bits in stream:
+                r1.value = bits & 1
+                g1.value = bits & 2
+                r2.value = bits & 4
+                g2.value = bits & 8
+                clockIO.value = True
+                clockIO.value = False
+        elif len(rgbIO) == 2:
+            r1,r2 = rgbIO
+            for bits in stream:
+                r1.value = bits & 1
+                r2.value = bits & 2
+                clockIO.value = True
+                clockIO.value = False
+        else:
+            for bits in stream:
+                for i in range(len(rgbIO)):
+                    rgbIO[i].value = bits & (1<<i)
+                clockIO.value = True
+                clockIO.value = False
+
+    def latch(self):
+        self._latchIO.value = True
+        self._latchIO.value = False
+
+    def address(self,row):
+        for i in range(len(self._addrIO)):
+            self._addrIO[i].value = row & (1<<i)
+
+    def enable(self,on):
+        self._OEIO.value = not on       # OE is active low
+
+    def deinit(self):
+        self._clockIO.deinit()
+        self._latchIO.deinit()
+        self._OEIO.deinit()
+
+        for pin in self._addrIO:
+            pin.deinit()
+        for pin in self._rgbIO:
+            pin.deinit()
+        for pin in self._unused_rgbIO:
+            pin.deinit()
+
+class MicroPythonPins:
+    """
+    Pin backend using MicroPython machine.Pin objects. The pin names are passed directly to
+    machine.Pin so they should be valid machine.Pin parameters for the board.
+    """
+
+    def setup(self,addrPins,rgbPins,clockPin,latchPin,OEPin,unused_rgbPins=None):
+        self._clockIO = self._output(clockPin)
+        self._latchIO = self._output(latchPin)
+        self._OEIO = self._output(OEPin)
+        self._addrIO = [self._output(pin) for pin in addrPins]
+        self._rgbIO = [self._output(pin) for pin in rgbPins]
+        self._unused_rgbIO = []
+        if unused_rgbPins != None:
+            self._unused_rgbIO = [self._output(pin) for pin in unused_rgbPins]
+        self._numRGB = len(self._rgbIO) // 2
+
+    def _output(self,pin):
+        io = Pin(pin,Pin.OUT)
+        io.value(False)
+        return io
+
+    def shift(self,stream):
+        # Each byte of stream holds the RGB pin states for one clock, bit i is rgbPins[i]
+        rgbIO = self._rgbIO
+        clock = self._clockIO.value
+        if len(rgbIO) == 6:
+            r1,g1,b1,r2,g2,b2 = [pin.value for pin in rgbIO]
+            for bits in stream:
+                r1(bits & 1)
+                g1(bits & 2)
+                b1(bits & 4)
+                r2(bits & 8)
+                g2(bits & 16)
+                b2(bits & 32)
+                clock(True)
+                clock(False)
+        elif len(rgbIO) == 4:
+            r1,g1,r2,g2 = [pin.value for pin in rgbIO]
+            for bits in stream:
+                r1(bits & 1)
+                g1(bits & 2)
+                r2(bits & 4)
+                g2(bits & 8)
+                clock(True)
+                clock(False)
+        elif len(rgbIO) == 2:
+            r1,r2 = [pin.value for pin in rgbIO]
+            for bits in stream:
+                r1(bits & 1)
+                r2(bits & 2)
+                clock(True)
+                clock(False)
+        else:
+            for bits in stream:
+                for i in range(len(rgbIO)):
+                    rgbIO[i].value(bits & (1<<i))
+                clock(True)
+                clock(False)
+
+    def latch(self):
+        self._latchIO.value(True)
+        self._latchIO.value(False)
+
+    def address(self,row):
+        for i in range(len(self._addrIO)):
+            self._addrIO[i].value(row & (1<<i))
+
+    def enable(self,on):
+        self._OEIO.value(not on)        # OE is active low
+
+    def deinit(self):
+        pass
+
+class SimulatedPanel:
+    """
+    A pure Python model of a HUB75 panel which can be used as a pin backend on a host without
+    any GPIO hardware (Linux CI, benchmarking). The model implements the panel's shift register,
+    output latch, row address decoder and active low output enable so the driver is exercised
+    through exactly the same pin operations it would perform on real hardware.
+
+    The LED state the panel would be showing is kept in the leds attribute (a list of bytearrays
+    using the same color values as the RGBMatrix framebuffer). Every pin write is counted in
+    the writes attribute and each pin's level changes are available from the toggles() method.
+
+    :param int rows: The number of rows on the simulated panel.
+    :param int cols: The number of columns (shift register length) of the simulated panel.
+    """
+
+    def __init__(self,rows,cols):
+        self.rows = rows
+        self.cols = cols
+        self.leds = [bytearray(cols) for i in range(rows)]
+        self._names = []
+
+    def setup(self,addrPins,rgbPins,clockPin,latchPin,OEPin,unused_rgbPins=None):
+        if unused_rgbPins == None:
+            unused_rgbPins = []
+        self._numRGB = len(rgbPins) // 2
+        self._numAddrPins = len(addrPins)
+        self._clk = len(rgbPins)
+        self._lat = self._clk + 1
+        self._oe = self._clk + 2
+        self._adr = self._clk + 3
+        self._names = list(rgbPins) + [clockPin,latchPin,OEPin] + list(addrPins) + list(unused_rgbPins)
+        self._state = bytearray(len(self._names))
+        self._shiftreg = bytearray(self.cols)
+        self._latched = bytes(self.cols)
+        self._row = 0
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.writes = 0
+        self.clocks = 0
+        self.latches = 0
+        self._toggles = [0] * len(self._names)
+
+    def toggles(self):
+        return dict(zip(self._names,self._toggles))
+
+    def _write(self,pin,value):
+        value = 1 if value else 0
+        self.writes += 1
+        if self._state[pin] == value:
+            return
+        self._state[pin] = value
+        self._toggles[pin] += 1
+
+        if value and pin == self._clk:          # rising clock edge shifts in the RGB pins
+            data = 0
+            for i in range(self._clk):
+                data |= self._state[i] << i
+            self._shiftreg[:-1] = self._shiftreg[1:]
+            self._shiftreg[-1] = data
+            self.clocks += 1
+        elif value and pin == self._lat:        # rising latch edge loads the output latch
+            self._latched = bytes(self._shiftreg)
+            self.latches += 1
+            self._show()
+        elif pin == self._oe or self._adr <= pin < self._adr + self._numAddrPins:
+            self._row = 0
+            for i in range(self._numAddrPins):
+                self._row |= self._state[self._adr+i] << i
+            self._show()
+
+    def _show(self):
+        if self._state[self._oe]:               # output disabled
+            return
+        numRGB = self._numRGB
+        top = self.leds[self._row]
+        bottom = self.leds[self._row + (self.rows // 2)]
+        for col in range(self.cols):
+            data = self._latched[col]
+            upper = 0
+            lower = 0
+            for i in range(numRGB):
+                upper = (upper << 1) | ((data >> i) & 1)
+                lower = (lower << 1) | ((data >> (i+numRGB)) & 1)
+            top[col] = upper
+            bottom[col] = lower
+
+    def value(self,row,col):
+        return self.leds[row][col]
+
+    def shift(self,stream):
+        for bits in stream:
+            for i in range(self._clk):
+                self._write(i,bits & (1<<i))
+            self._write(self._clk,True)
+            self._write(self._clk,False)
+
+    def latch(self):
+        self._write(self._lat,True)
+        self._write(self._lat,False)
+
+    def address(self,row):
+        for i in range(self._numAddrPins):
+            self._write(self._adr+i,row & (1<<i))
+
+    def enable(self,on):
+        self._write(self._oe,not on)
+
+    def deinit(self):
+        pass
+
+class PortPins:
+    """
+    Pin backend wrapper which shifts the RGB data using whole GPIO port register writes instead of
+    one call per pin. Each clock clears the zero RGB bits together with the clock bit in one write,
+    sets the one RGB bits in a second write and raises the clock in a third. This requires the RGB
+    and clock pins to be on the same GPIO port. The latch, address and OE pins as well as pin setup
+    are handled by the wrapped backend, which is also used for shifting if port is None.
+
+    :param backend: The per pin backend (CircuitPythonPins, MicroPythonPins or SimulatedPanel).
+    :param port: A port register writer (Mem32Port, GpiomemPort or SimulatedPort) or None to fall
+        back to per pin writes.
+    :param list[int] rgbBits: The port bit numbers of the RGB pins, in the same order as rgbPins.
+    :param int clockBit: The port bit number of the clock pin.
+    """
+
+    def __init__(self,backend,port,rgbBits,clockBit):
+        self._backend = backend
+        self._port = port
+        self._rgbBits = rgbBits
+        self._clockBit = clockBit
+
+    def setup(self,addrPins,rgbPins,clockPin,latchPin,OEPin,unused_rgbPins=None):
+        if len(rgbPins) != len(self._rgbBits):
+            raise ValueError(f'{len(rgbPins)} RGB pins require {len(rgbPins)} rgbBits')
+        self._backend.setup(addrPins,rgbPins,clockPin,latchPin,OEPin,unused_rgbPins)
+        if hasattr(self._port,'attach'):
+            self._port.attach(self._rgbBits,self._clockBit)
+
+        # Register masks for every possible stream byte
+        self._clockmask = 1 << self._clockBit
+        self._setmask = []
+        self._clearmask = []
+        for bits in range(1 << len(self._rgbBits)):
+            setmask = 0
+            clearmask = self._clockmask
+            for i in range(len(self._rgbBits)):
+                if bits & (1 << i):
+                    setmask |= 1 << self._rgbBits[i]
+                else:
+                    clearmask |= 1 << self._rgbBits[i]
+            self._setmask.append(setmask)
+            self._clearmask.append(clearmask)
+
+    def shift(self,stream):
+        if self._port is None:
+            self._backend.shift(stream)
+            return
+        write = self._port.write
+        setmask = self._setmask
+        clearmask = self._clearmask
+        clockmask = self._clockmask
+        for bits in stream:
+            write(setmask[bits],clearmask[bits])     # RGB data with the clock low
+            write(clockmask,0)                       # rising clock edge
+
+    def latch(self):
+        self._backend.latch()
+
+    def address(self,row):
+        self._backend.address(row)
+
+    def enable(self,on):
+        self._backend.enable(on)
+
+    def deinit(self):
+        self._backend.deinit()
+
+class Mem32Port:
+    """
+    Port register writer for MicroPython using machine.mem32 with separate set and clear
+    registers, for example the GPIO DR_SET (base+0x84) and DR_CLEAR (base+0x88) registers of the
+    i.MX RT1062 on the Teensy 4/4.1.
+
+    :param int setReg: The address of the port's bit set register.
+    :param int clearReg: The address of the port's bit clear register.
+    """
+
+    def __init__(self,setReg,clearReg):
+        from machine import mem32
+        self._mem32 = mem32
+        self._setReg = setReg
+        self._clearReg = clearReg
+
+    def write(self,setmask,clearmask):
+        if clearmask:
+            self._mem32[self._clearReg] = clearmask
+        if setmask:
+            self._mem32[self._setReg] = setmask
+
+class GpiomemPort:
+    """
+    Port register writer for Linux which maps the GPIO registers through /dev/gpiomem. The default
+    register offsets are the GPSET0 and GPCLR0 registers of the Raspberry Pi's BCM283x/BCM2711.
+
+    :param int setOffset: The byte offset of the bit set register.
+    :param int clearOffset: The byte offset of the bit clear register.
+    :param str device: The GPIO memory device to map.
+    """
+
+    def __init__(self,setOffset=0x1c,clearOffset=0x28,device='/dev/gpiomem'):
+        import mmap
+        import os
+        fd = os.open(device,os.O_RDWR | os.O_SYNC)
+        try:
+            self._mmap = mmap.mmap(fd,4096,mmap.MAP_SHARED,mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            os.close(fd)
+        self._regs = memoryview(self._mmap).cast('I')
+        self._setReg = setOffset // 4
+        self._clearReg = clearOffset // 4
+
+    def write(self,setmask,clearmask):
+        if clearmask:
+            self._regs[self._clearReg] = clearmask
+        if setmask:
+            self._regs[self._setReg] = setmask
+
+class SimulatedPort:
+    """
+    Port register writer for a SimulatedPanel backend. Register writes are decoded into pin level
+    changes on the panel model. The number of register writes, counted the same way as Mem32Port
+    and GpiomemPort write their set and clear registers, is kept in the writes attribute.
+
+    :param SimulatedPanel panel: The simulated panel the port's pins are connected to.
+    """
+
+    def __init__(self,panel):
+        self._panel = panel
+        self._pins = []
+        self.writes = 0
+
+    def attach(self,rgbBits,clockBit):
+        # Port bit and panel pin index pairs, the RGB pins come first on a SimulatedPanel
+        self._pins = [(1 << bit,i) for i,bit in enumerate(rgbBits)]
+        self._pins.append((1 << clockBit,len(rgbBits)))
+
+    def write(self,setmask,clearmask):
+        if clearmask:
+            self.writes += 1
+        if setmask:
+            self.writes += 1
+        for mask,pin in self._pins:
+            if clearmask & mask:
+                self._panel._write(pin,False)
+        for mask,pin in self._pins:
+            if setmask & mask:
+                self._panel._write(pin,True)
+
+class _StatsPins:
+    # Pin backend proxy installed by RGBMatrix.enable_stats() to collect refresh counters. When
+    # statistics are disabled the proxy is removed so the refresh loop doesn't pay for it.
+
+    def __init__(self,backend,scanrows,callback=None):
+        self._backend = backend
+        self._scanrows = scanrows
+        self.callback = callback
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.clocks = 0
+        self.skipped = 0
+        self.maxgap = 0
+        self.ontime = [0] * self._scanrows
+        self._start = _ticks_us()
+        self._row = 0
+        self._lit = None            # time OE was enabled, None while the display is off
+        self._shifted = True
+        self._returned = None       # time the last refresh call returned
+
+    def called(self):
+        if self._returned is not None:
+            gap = _ticks_diff(_ticks_us(),self._returned)
+            if gap > self.maxgap:
+                self.maxgap = gap
+
+    def returned(self):
+        self._returned = _ticks_us()
+
+    def stats(self):
+        frames = self.frames
+        elapsed = _ticks_diff(_ticks_us(),self._start)
+        return {
+            'frames': frames,
+            'fps': frames * 1000000 / elapsed if elapsed > 0 else 0,
+            'rows_skipped': self.skipped,
+            'clocks': self.clocks,
+            'clocks_per_frame': self.clocks / frames if frames else 0,
+            'row_on_us': [ontime / frames if frames else 0 for ontime in self.ontime],
+            'max_gap_us': self.maxgap,
+        }
+
+    def shift(self,stream):
+        self.clocks += len(stream)
+        self._shifted = True
+        self._backend.shift(stream)
+
+    def latch(self):
+        if not self._shifted:
+            self.skipped += 1
+        self._shifted = False
+        self._backend.latch()
+
+    def address(self,row):
+        if self._lit is not None:
+            now = _ticks_us()
+            self.ontime[self._row] += _ticks_diff(now,self._lit)
+            self._lit = now
+        # A frame is complete once its last scan row is displayed, BCM addresses a row once per plane
+        last = row == self._scanrows - 1 and self._row != row
+        self._row = row
+        self._backend.address(row)
+        if last:
+            self.frames += 1
+            if self.callback is not None:
+                self.callback(self.stats())
+
+    def enable(self,on):
+        if on:
+            if self._lit is None:
+                self._lit = _ticks_us()
+        elif self._lit is not None:
+            self.ontime[self._row] += _ticks_diff(_ticks_us(),self._lit)
+            self._lit = None
+        self._backend.enable(on)
+
+    def deinit(self):
+        self._backend.deinit()
+
+class Bitmap:
+    """
+    A rectangular image which can be copied onto an RGBMatrix with RGBMatrix.blit(). Each row of
+    pixels is packed into whole bytes with the given number of bits per pixel, most significant
+    bits first, so a 1 bit bitmap stores 8 pixels per byte and a 3 bit bitmap holds one RGB color
+    value (0-7) per pixel in 3 bits. Rows of a packed bitmap are unpacked once and cached for
+    blitting, 8 bit bitmaps are used directly without copying.
+
+    :param int rows: The number of rows in the bitmap.
+    :param int cols: The number of columns in the bitmap.
+    :param int bits: The number of bits per pixel (1-8).
+    :param data: Optional bytes like object (bytes, bytearray or memoryview) with the packed pixel
+        data, rows*((cols*bits+7)//8) bytes. By default a zeroed bytearray is allocated.
+    """
+
+    def __init__(self,rows,cols,bits=8,data=None):
+        if bits < 1 or bits > 8:
+            raise ValueError(f'A Bitmap can not have {bits} bits per pixel')
+        self.rows = rows
+        self.cols = cols
+        self.bits = bits
+        self._stride = (cols*bits + 7) // 8
+        if data is None:
+            data = bytearray(rows * self._stride)
+        elif len(data) < rows * self._stride:
+            raise ValueError(f'A {rows}x{cols} Bitmap with {bits} bits per pixel requires {rows * self._stride} bytes')
+        self.data = data
+        self._view = memoryview(data)
+        self._unpacked = [None] * rows
+
+    def row(self,row):
+        # Pixel values of one row, one per byte
+        if self.bits == 8:
+            return self._view[row*self.cols:(row+1)*self.cols]
+        pixels = self._unpacked[row]
+        if pixels is None:
+            bits = self.bits
+            mask = (1 << bits) - 1
+            data = self.data
+            start = row * self._stride
+            last = start + self._stride - 1
+            pixels = bytearray(self.cols)
+            for col in range(self.cols):
+                bit = col * bits
+                index = start + bit // 8
+                window = (data[index] << 8) | (data[index+1] if index < last else 0)
+                pixels[col] = (window >> (16 - bits - bit % 8)) & mask
+            self._unpacked[row] = pixels
+        return pixels
+
+    def value(self,row,col):
+        return self.row(row)[col]
+
+    def point(self,row,col,color=1):
+        bits = self.bits
+        if bits == 8:
+            self.data[row*self.cols + col] = color
+            return
+        bit = col * bits
+        index = row*self._stride + bit // 8
+        shift = 16 - bits - bit % 8
+        window = (self.data[index] << 8) | (self.data[index+1] if bit % 8 + bits > 8 else 0)
+        window = (window & ~(((1 << bits) - 1) << shift)) | ((color & ((1 << bits) - 1)) << shift)
+        self.data[index] = window >> 8
+        if bit % 8 + bits > 8:
+            self.data[index+1] = window & 0xff
+        self._unpacked[row] = None
+
+class BitmapFont:
+    """
+    A compact bitmap font for RGBMatrix.text(). Each glyph is stored as a bytes object with one
+    entry per column, bit 0 being the top row of the glyph. Fonts taller than 8 rows use
+    (height+7)//8 bytes per column, least significant byte first. The width of a glyph is the
+    number of its columns so proportional fonts are supported.
+
+    Glyphs are decoded into horizontal spans the first time they are drawn and kept in a least
+    recently used cache, glyphs are evicted once the decoded spans exceed cacheSize bytes.
+
+    :param int height: The number of rows in every glyph.
+    :param dict glyphs: A dictionary of character to column bytes.
+    :param int spacing: The number of blank columns between glyphs.
+    :param str default: The glyph drawn for characters missing from the font (lower case letters
+        fall back to upper case first).
+    :param int cacheSize: The memory budget in bytes for decoded glyph spans.
+    """
+
+    def __init__(self,height,glyphs,spacing=1,default='?',cacheSize=1024):
+        self.height = height
+        self.glyphs = glyphs
+        self.spacing = spacing
+        self.default = default
+        self.cacheSize = cacheSize
+        self._cache = OrderedDict()
+        self._cached = 0
+
+    def _glyph(self,char):
+        glyph = self.glyphs.get(char)
+        if glyph is None:
+            glyph = self.glyphs.get(char.upper(),self.glyphs.get(self.default,b''))
+        return glyph
+
+    def width(self,char):
+        return len(self._glyph(char)) // ((self.height + 7) // 8)
+
+    def spans(self,char):
+        # Decoded (row,col0,col1) spans of a glyph, three bytes each, from the LRU cache
+        spans = self._cache.pop(char,None)
+        if spans is None:
+            glyph = self._glyph(char)
+            step = (self.height + 7) // 8
+            columns = []
+            for col in range(0,len(glyph),step):
+                bits = 0
+                for i in range(step):
+                    bits |= glyph[col+i] << (8*i)
+                columns.append(bits)
+            spans = bytearray()
+            for row in range(self.height):
+                start = None
+                for col in range(len(columns)+1):
+                    on = col < len(columns) and (columns[col] >> row) & 1
+                    if on and start is None:
+                        start = col
+                    elif not on and start is not None:
+                        spans.extend((row,start,col-1))
+                        start = None
+            spans = bytes(spans)
+            self._cached += len(spans) + 16
+            while self._cache and self._cached > self.cacheSize:
+                oldest = next(iter(self._cache))
+                self._cached -= len(self._cache.pop(oldest)) + 16
+        self._cache[char] = spans
+        return spans
+
+    def measure(self,text):
+        # (rows,cols) the text occupies when drawn, lines are separated by one blank row
+        lines = text.split('\n')
+        cols = 0
+        for line in lines:
+            width = sum(self.width(char) for char in line) + self.spacing * max(len(line)-1,0)
+            cols = max(cols,width)
+        return len(lines) * (self.height + 1) - 1,cols
+
+# Built in 3x5 font with digits, upper case letters and common punctuation
+FONT_3X5 = BitmapFont(5,{
+    ' ': b'\x00\x00\x00', '0': b'\x1f\x11\x1f', '1': b'\x12\x1f\x10', '2': b'\x1d\x15\x17',
+    '3': b'\x15\x15\x1f', '4': b'\x07\x04\x1f', '5': b'\x17\x15\x1d', '6': b'\x1f\x15\x1d',
+    '7': b'\x01\x01\x1f', '8': b'\x1f\x15\x1f', '9': b'\x17\x15\x1f', 'A': b'\x1e\x05\x1e',
+    'B': b'\x1f\x15\n', 'C': b'\x0e\x11\x11', 'D': b'\x1f\x11\x0e', 'E': b'\x1f\x15\x11',
+    'F': b'\x1f\x05\x01', 'G': b'\x0e\x11\x1d', 'H': b'\x1f\x04\x1f', 'I': b'\x11\x1f\x11',
+    'J': b'\x08\x10\x0f', 'K': b'\x1f\x04\x1b', 'L': b'\x1f\x10\x10', 'M': b'\x1f\x06\x1f',
+    'N': b'\x1f\x01\x1e', 'O': b'\x0e\x11\x0e', 'P': b'\x1f\x05\x02', 'Q': b'\x0e\x19\x16',
+    'R': b'\x1f\x05\x1a', 'S': b'\x12\x15\t', 'T': b'\x01\x1f\x01', 'U': b'\x1f\x10\x1f',
+    'V': b'\x0f\x10\x0f', 'W': b'\x1f\x0c\x1f', 'X': b'\x1b\x04\x1b', 'Y': b'\x03\x1c\x03',
+    'Z': b'\x19\x15\x13', '.': b'\x10', ',': b'\x10\x08', ':': b'\n', ';': b'\x10\n', '!': b'\x17',
+    '?': b'\x01\x15\x02', "'": b'\x03', '"': b'\x03\x00\x03', '-': b'\x04\x04\x04',
+    '+': b'\x04\x0e\x04', '=': b'\n\n\n', '*': b'\x05\x02\x05', '/': b'\x18\x04\x03',
+    '%': b'\x19\x04\x13', '(': b'\x0e\x11', ')': b'\x11\x0e', '<': b'\x04\n\x11',
+    '>': b'\x11\n\x04', '_': b'\x10\x10\x10', '#': b'\x1f\n\x1f',
+})
+
+class PanelLayout:
+    """
+    Describes how a chain of identical HUB75 panels is tiled into one larger virtual canvas. The
+    panels are arranged in a grid of across x down tiles and chained row by row starting with the
+    top left tile. The chain is driven as one long shift register, panel i of the chain taking
+    the columns i*panelCols to (i+1)*panelCols-1 it would show if the chain was driven as a single
+    panelRows x (across*down*panelCols) RGBMatrix.
+
+    :param int panelRows: The number of rows of each panel.
+    :param int panelCols: The number of columns of each panel.
+    :param int across: The number of tiles in each row of the grid.
+    :param int down: The number of rows of tiles in the grid.
+    :param bool serpentine: If True the chain snakes through the grid, every other row of tiles is
+        chained from right to left and mounted upside down (rotated by 180 degrees).
+    :param int rotation: The clockwise rotation (0, 90, 180 or 270 degrees) of every tile.
+    :param list[int] rotations: Optional rotation of each panel in chain order, overriding rotation.
+        Tiles rotated by 90 or 270 degrees are panelCols rows high, mixing them with unrotated tiles
+        requires square panels.
+    """
+
+    def __init__(self,panelRows,panelCols,across,down=1,serpentine=False,rotation=0,rotations=None):
+        panels = across * down
+        if rotations is None:
+            rotations = [rotation] * panels
+        if len(rotations) != panels or any(rot % 90 for rot in rotations):
+            raise ValueError('A rotation of 0, 90, 180 or 270 degrees is required for each panel')
+        upright = [rot % 180 == 0 for rot in rotations]
+        if panelRows != panelCols and any(upright) and not all(upright):
+            raise ValueError('Tiles rotated by 90 or 270 degrees can only be mixed with other tiles on square panels')
+
+        self.panelRows = panelRows
+        self.panelCols = panelCols
+        self.panels = panels
+        self.tileRows = panelRows if upright[0] else panelCols
+        self.tileCols = panelCols if upright[0] else panelRows
+        self.rows = down * self.tileRows
+        self.cols = across * self.tileCols
+        self.chainCols = panels * panelCols
+        self._tiles = []
+        for panel in range(panels):
+            tilerow = panel // across
+            tilecol = panel % across
+            rot = rotations[panel]
+            if serpentine and tilerow % 2:
+                tilecol = across - 1 - tilecol
+                rot += 180
+            self._tiles.append((tilerow * self.tileRows,tilecol * self.tileCols,rot % 360))
+
+    def canvas(self,panelRow,chainCol):
+        # Canvas (row,col) shown by the LED at a row of the panels and a column of the chain
+        row0,col0,rot = self._tiles[chainCol // self.panelCols]
+        col = chainCol % self.panelCols
+        if rot == 0:
+            return row0 + panelRow,col0 + col
+        if rot == 90:
+            return row0 + col,col0 + self.panelRows - 1 - panelRow
+        if rot == 180:
+            return row0 + self.panelRows - 1 - panelRow,col0 + self.panelCols - 1 - col
+        return row0 + self.panelCols - 1 - col,col0 + panelRow
+
+    def segments(self,panelRow):
+        # The canvas pixels of one panel row along the whole chain as (row,col,count,drow,dcol)
+        # runs, each run walking a canvas row or column in a straight line
+        segments = []
+        for chainCol in range(self.chainCols):
+            row,col = self.canvas(panelRow,chainCol)
+            if segments:
+                srow,scol,count,drow,dcol = segments[-1]
+                if count == 1 and abs(row-srow) + abs(col-scol) == 1:
+                    segments[-1] = (srow,scol,2,row-srow,col-scol)
+                    continue
+                if count > 1 and (row,col) == (srow + count*drow,scol + count*dcol):
+                    segments[-1] = (srow,scol,count+1,drow,dcol)
+                    continue
+            segments.append((row,col,1,0,1))
+        return segments
+
+class Animation:
+    """
+    A pre-rendered animation streamed from a file and played on an RGBMatrix with
+    RGBMatrix.play(). The file holds a keyframe followed by one delta per frame, each delta being a
+    list of the changed spans of pixels, run-length encoded as either a single fill color or the
+    literal pixel values. Only one delta is read at a time so the animation can be played straight
+    from flash, and applying a delta is a few slice writes into the framebuffer. Animation.encode()
+    creates the file from a sequence of framebuffers.
+
+    The last delta leads from the last frame back to the keyframe so a looping animation never has
+    to redraw the keyframe.
+
+    :param str filename: The animation file to play.
+    :param int row: The display row the top of the animation is drawn at.
+    :param int col: The display column the left of the animation is drawn at.
+    :param bool loop: If True the animation repeats forever, otherwise it stops on its last frame.
+    """
+
+    _HEADER = '<4sBHHHBH'       # magic, version, rows, cols, frames, bytes per pixel, first duration
+    _FILL = 0x8000              # span length flag of a single color run
+
+    def __init__(self,filename,row=0,col=0,loop=True):
+        self._file = open(filename,'rb')
+        header = self._file.read(struct.calcsize(self._HEADER))
+        magic,version,rows,cols,frames,pixelbytes,duration = struct.unpack(self._HEADER,header)
+        if magic != b'RMAN' or version != 1:
+            self._file.close()
+            raise ValueError(f'{filename} is not an RGBMatrix animation file')
+        self.rows = rows
+        self.cols = cols
+        self.frames = frames
+        self.row = row
+        self.col = col
+        self.loop = loop
+        self.frame = 0              # frame currently displayed
+        self.done = False
+        self._pixelbytes = pixelbytes
+        self._duration = duration
+        self._keyframe = self._file.tell()
+        self._deltas = self._keyframe + rows*cols*pixelbytes
+        self._buffer = bytearray(cols*pixelbytes)
+        self._shown = 0
+        self._wait = 0
+
+    def close(self):
+        self._file.close()
+
+    def _write(self,matrix,row,col,count,color=None):
+        # Applies one span of the animation, clipped to the display
+        if color is None:
+            view = memoryview(self._buffer)[:count*self._pixelbytes]
+            self._file.readinto(view)
+            if self._pixelbytes == 1:
+                pixels = view
+            else:
+                pixels = array('H',struct.unpack(f'<{count}H',view))
+        row += self.row
+        col += self.col
+        if not 0 <= row < matrix.rows:
+            return
+        col0 = max(col,0)
+        col1 = min(col+count,matrix.cols)
+        if col0 >= col1:
+            return
+        if color is None:
+            matrix._blitspan(row,col0,pixels[col0-col:col1-col])
+        else:
+            matrix._span(row,col0,col1-1,color)
+
+    def start(self,matrix):
+        # Draws the keyframe and restarts the frame schedule
+        self._file.seek(self._keyframe)
+        for row in range(self.rows):
+            self._write(matrix,row,0,self.cols)
+        self.frame = 0
+        self.done = False
+        self._shown = _ticks_us()
+        self._wait = self._duration * 1000
+
+    def advance(self,matrix):
+        # Applies the delta leading to the next frame, returns how long it is shown for in ms
+        duration,count = struct.unpack('<HH',self._file.read(4))
+        pixelbytes = self._pixelbytes
+        for i in range(count):
+            row,col,length = struct.unpack('<HHH',self._file.read(6))
+            if length & self._FILL:
+                color = self._file.read(pixelbytes)
+                self._write(matrix,row,col,length & ~self._FILL,color[0] if pixelbytes == 1 else color[0] | (color[1] << 8))
+            else:
+                self._write(matrix,row,col,length)
+        self.frame += 1
+        if self.frame == self.frames:
+            self.frame = 0
+            self._file.seek(self._deltas)
+        return duration
+
+    def update(self,matrix):
+        # Called by the RGBMatrix refresh at the start of every refresh frame, shows the next
+        # frame once the current one is due. Returns False when a non looping animation has ended.
+        now = _ticks_us()
+        late = _ticks_diff(now,self._shown) - self._wait
+        if late < 0:
+            return True
+        if not self.loop and self.frame == self.frames - 1:
+            self.done = True
+            return False
+        wait = self.advance(matrix) * 1000
+        # Time the next frame from when this one was due so a late frame doesn't slow the animation
+        self._shown = now
+        self._wait = wait - min(late,wait)
+        return True
+
+    @staticmethod
+    def _pack(pixels,pixelbytes):
+        if pixelbytes == 1:
+            return bytes(pixels)
+        return struct.pack(f'<{len(pixels)}H',*pixels)
+
+    @staticmethod
+    def _delta(old,new,duration,pixelbytes):
+        # Changed spans of each row, unchanged gaps of fewer than 4 pixels are merged into a span
+        # as they cost less than another span header. Runs of 8 or more pixels of one color and
+        # spans of a single color are stored as fills, the rest as literal pixel values.
+        records = []
+        for row in range(len(new)):
+            before = old[row]
+            after = new[row]
+            cols = len(after)
+            col = 0
+            while col < cols:
+                if before[col] == after[col]:
+                    col += 1
+                    continue
+                last = col
+                end = col + 1
+                while end < cols and end - last < 4:
+                    if before[end] != after[end]:
+                        last = end
+                    end += 1
+                end = last + 1
+
+                start = col
+                while start < end:
+                    run = start
+                    while run < end and after[run] == after[start]:
+                        run += 1
+                    if run - start >= 8 or (start == col and run == end):
+                        records.append(struct.pack('<HHH',row,start,(run-start) | Animation._FILL))
+                        records.append(Animation._pack(after[start:start+1],pixelbytes))
+                        start = run
+                        continue
+                    literal = run
+                    while literal < end:
+                        run = literal
+                        while run < end and after[run] == after[literal]:
+                            run += 1
+                        if run - literal >= 8:
+                            break
+                        literal = run
+                    records.append(struct.pack('<HHH',row,start,literal-start))
+                    records.append(Animation._pack(after[start:literal],pixelbytes))
+                    start = literal
+                col = end
+        return struct.pack('<HH',duration,len(records) // 2) + b''.join(records)
+
+    @staticmethod
+    def encode(filename,frames,durations=100):
+        # frames may be any iterable (such as a generator) of framebuffers, only the first and the
+        # previous frame are kept
+        first = None
+        previous = None
+        count = 0
+        with open(filename,'wb') as f:
+            for frame in frames:
+                pixels = [[int(value) for value in row] for row in frame]
+                duration = durations if isinstance(durations,int) else durations[count]
+                if first is None:
+                    first = pixels
+                    pixelbytes = getattr(frame[0],'itemsize',1)
+                    f.write(struct.pack(Animation._HEADER,b'RMAN',1,len(pixels),len(pixels[0]),0,pixelbytes,duration))
+                    for row in pixels:
+                        f.write(Animation._pack(row,pixelbytes))
+                else:
+                    f.write(Animation._delta(previous,pixels,duration,pixelbytes))
+                previous = pixels
+                count += 1
+            if first is None:
+                raise ValueError('An animation requires at least one frame')
+            # The last delta leads back to the keyframe
+            duration = durations if isinstance(durations,int) else durations[0]
+            f.write(Animation._delta(previous,first,duration,pixelbytes))
+            f.seek(0)
+            f.write(struct.pack(Animation._HEADER,b'RMAN',1,len(first),len(first[0]),count,pixelbytes,duration))
+
 class RGBMatrix:
     """
     A driver for HUB75 RGB matrix display panels.
@@ -43,7 +1030,8 @@ class RGBMatrix:
         matricies "color depth" and pixel brightness is controlled by varying the amount of time (PWM)
         an LED is on during a refresh cycle, however due to the speed limitations of this implementation
         each Red, Green or Blue LED is either on or off each refresh cycle so while 8 colors can be
-        displayed there is no additional depth or brightness control available.   
+        displayed there is no additional depth or brightness control available unless the colordepth
+        parameter is used.
     :param str clockPin: String representations of the matrix's clock pin. For CircuitPython the
         string should be a BOARD attribute and for MicroPython the string should be valid machine.Pin parameter.
     :param str latchPin: String representations of the matrix's latch pin. For CircuitPython the
@@ -55,6 +1043,29 @@ class RGBMatrix:
         update speed and reduce flickering. Any pins linsted in the parameter should be omitted from the 
         rgbPins parameter. For CircuitPython the strings should be BOARD attributes and for MicroPython the
         strings should be valid machine.Pin parameters.
+    :param backend: The pin backend used to drive the matrix. By default a CircuitPythonPins or
+        MicroPythonPins backend is selected based on the running implementation. A SimulatedPanel
+        instance may be passed to run the driver on a host without any GPIO hardware and a PortPins
+        wrapper can be used to shift the RGB data with GPIO port register writes.
+    :param int colordepth: The number of bits per color channel held in each framebuffer value. With
+        the default of 1 each LED is simply on or off. Larger values enable Binary Code Modulation
+        (BCM), each refresh displays bit plane k of every row for 2^k time units. Color values are
+        packed with the first color channel (red) in the most significant bits, see RGBMatrix.color().
+    :param int bcmTime: The number of microseconds the least significant bit plane is displayed for
+        when colordepth is greater than 1.
+    :param bool numpyBuffer: If True (CPython only) the framebuffer is a two dimensional NumPy array,
+        which may be drawn into directly with NumPy operations through RGBMatrix.framebuffer (followed by
+        a call to RGBMatrix.mark_dirty()), and fills and row stream updates are performed with NumPy.
+    :param PanelLayout layout: Optional layout of a chain of panels tiled into one virtual canvas. rows
+        and cols are then the size of the canvas and addrPins are those of a single panel. Each scan
+        row of the chain is gathered from the canvas through a precomputed map of canvas runs and
+        shifted out in one burst for all the panels.
+    :param str dither: Optional temporal dithering mode, 'ordered' or 'diffusion', used instead of BCM
+        when colordepth is greater than 1. Each channel value v is displayed as v lit frames out of a cycle
+        of 2^colordepth-1 one bit sub-frames, shown one per refresh through the 1 bit refresh path. The
+        sub-frame streams of a row are precomputed whenever it changes. 'ordered' lights the frames of a
+        value in a bit reversed order and 'diffusion' carries the error of each frame into the next, both
+        offset across neighbouring pixels by a 4x4 Bayer matrix to reduce flicker.
     
     .. py:method:: RGBMatrix.deinit()
 
@@ -64,22 +1075,30 @@ class RGBMatrix:
 
         Performs a non-blocking check to see if any uart input is available for processing
 
-    .. py:method:: RGBMatrix.fill(color,replace=None,swap=False)
+    .. py:method:: RGBMatrix.fill(color,replace=None,swap=False,bounds=None)
 
         Colors all pixels the supplied "color". The color value can be 0-7. If a color value is passed
         as the replace argument then only pixels that are currently the "replace" color will be
         replaced (filled) with the new "color" value. The swap parameter modifies the replace function
         by also replacing (filling) any existing pixels that were originally the "replace" color with
         "color" pixels, essentially swapping the "color" and "replace" colored pixels.
+        If bounds is a (row1,col1,row2,col2) tuple only the pixels within that rectangle (inclusive)
+        are affected. Filling works on whole rows at a time.
 
     .. py:method:: RGBMatrix.fillarea(row,col,color,animate=False,optimize=True)
 
         Colors all pixels within a bounded area the supplied "color". The color value can be 0-7. The
         background color being replaced is whatever color is at location (row,col). Any pixels which are the
         background color are replaced until a pixel of a different color or the display border is
-        encountered. Filling proceeds outward from the (row,col) point. If animate is to True the screen
-        will be refreshed as the fill occurs. The optimize parameter is used during the fill animation 
-        if enabled.
+        encountered. Filling proceeds outward from the (row,col) point one horizontal span at a time. If
+        animate is to True the screen will be refreshed after each span is filled. The optimize parameter
+        is used during the fill animation if enabled.
+
+    .. py:method:: RGBMatrix.fillarea_spans(row,col,color=1)
+
+        A generator which performs the same fill as RGBMatrix.fillarea one horizontal span at a time,
+        yielding the row of each span after it has been filled. This lets a program refresh the display
+        or do other work while a large area is being filled.
 
     .. py:method:: RGBMatrix.input(prompt=None,optimize=True,silent=False)
 
@@ -92,10 +1111,56 @@ class RGBMatrix:
         sleeps for a given number of seconds. While sleeping the RGB matrix display is refreshed using   
         the specified optimize value (see RGBMatrix.refresh).   
 
+    .. py:method:: RGBMatrix.run(refresh_hz=None,rows=4,optimize=True)
+
+        A coroutine which continually refreshes the display under asyncio (CircuitPython, MicroPython or
+        CPython) so other coroutines can run alongside the display. The scan rows are refreshed in
+        slices of the given number of rows with control returned to the asyncio scheduler after every
+        slice. The display is turned off while other coroutines run so the last row of a slice is not
+        lit longer than the others. If refresh_hz is given, the time left in each frame is spread
+        between the slices to limit the refresh rate to roughly that many frames per second. The task
+        runs until RGBMatrix.stop() is called.
+
+    .. py:method:: RGBMatrix.stop()
+
+        Stops a running RGBMatrix.run() refresh task or the background refresh thread, waiting for
+        the thread to finish its current refresh pass.
+
+    .. py:method:: RGBMatrix.start_background_refresh(optimize=True)
+
+        Starts refreshing the display continually in a separate thread (using the _thread module, for
+        example CPython/Blinka on a Raspberry Pi) so the main program is free to block on I/O without
+        blanking the panel. Frames should be drawn with RGBMatrix.begin_frame() and committed with
+        RGBMatrix.swap(), the refresh thread picks up each committed frame between refresh passes
+        without any locking. A swap() made before the previous frame has been picked up sleeps until it
+        is, rather than spinning against the refresh thread. RGBMatrix.stop() ends the background refresh.
+
+    .. py:method:: RGBMatrix.sleep_async(seconds,optimize=True)
+
+        The asyncio version of RGBMatrix.sleep(). If the RGBMatrix.run() task is running this simply
+        waits, otherwise the display is refreshed while waiting, yielding to other coroutines between
+        refreshes.
+
+    .. py:method:: RGBMatrix.input_async(prompt=None,optimize=True,silent=False)
+
+        The asyncio version of RGBMatrix.input(). Other coroutines keep running while waiting for the
+        user's input and, if the RGBMatrix.run() task isn't running, the display is refreshed between
+        keystroke checks.
+
     .. py:method:: RGBMatrix.off()
 
         Turns the display off.
 
+    .. py:attribute:: RGBMatrix.brightness
+
+        The overall brightness of the display from 0 (dark) to 1 (full brightness, the default). The
+        brightness is set by the portion of each row period the output enable (OE) pin is asserted for, so
+        the colors are unchanged. Each row is lit only while the first part of the next row is shifted in,
+        which keeps the refresh rate the same at every brightness, so while dimmed every row is shifted in
+        and the optimize parameter of the refresh methods has no effect. A dimmed refresh() turns the
+        display off before it returns so the last row isn't lit at full duty between calls. With colordepth
+        greater than 1 the lit portion of every bit plane's display time is shortened instead.
+
     .. py:method:: RGBMatrix.refresh(optimize=True)
 
         Refreshes the RGB matrix display. This function must be performed as frequently as possible.
@@ -106,10 +1171,88 @@ class RGBMatrix:
         being displayed while the shift registers are being filled. Setting optimize to False disables
         this optimization.
 
+    .. py:method:: RGBMatrix.refresh_step(budget_us,optimize=True)
+
+        Refreshes as many scan rows as fit in the budget_us microsecond time budget (at least one row)
+        and returns the number of rows refreshed. Each call resumes scanning from the row after the last
+        one refreshed by the previous call, so calling refresh_step repeatedly, interleaved with other
+        work such as UART parsing, displays the whole image at a known cadence. The display is turned
+        off when the budget runs out and the last row is relit when the next call resumes so every row
+        gets the same on-time regardless of where the steps start and stop.
+
+    .. py:method:: RGBMatrix.enable_stats(callback=None)
+
+        Starts collecting refresh performance counters, see RGBMatrix.stats(). If a callback function is
+        provided it is called with the statistics dictionary each time a full frame has been refreshed.
+        The counters are collected by a proxy placed in front of the pin backend, so while statistics
+        are disabled (the default) the refresh loop runs exactly as it would without them.
+
+    .. py:method:: RGBMatrix.disable_stats()
+
+        Stops collecting refresh performance counters and removes the per frame callback.
+
+    .. py:method:: RGBMatrix.stats()
+
+        Returns a dictionary of the refresh counters collected since RGBMatrix.enable_stats() or
+        RGBMatrix.reset_stats() was called, or None if statistics are disabled. The dictionary holds
+        frames (full frames refreshed), fps (the full frame refresh rate), rows_skipped (rows displayed
+        without shifting by the optimize option), clocks and clocks_per_frame (clock pulses shifted),
+        row_on_us (a list with the average time, in microseconds, each scan row spends with OE on per
+        frame) and max_gap_us (the worst case time between the end of one RGBMatrix.refresh() or
+        RGBMatrix.refresh_step() call and the start of the next).
+
+    .. py:method:: RGBMatrix.reset_stats()
+
+        Resets the refresh performance counters.
+
     .. py:method:: RGBMatrix.sendrow(row)
 
         Refreshes a single row of the display.
 
+    .. py:method:: RGBMatrix.dirty_rows()
+
+        Returns a list of the framebuffer rows that have been changed by any of the drawing methods
+        since RGBMatrix.clear_dirty() was last called. The refresh method keeps its own record of
+        changed rows so it only rebuilds the shift data for rows that have actually changed.
+
+    .. py:method:: RGBMatrix.clear_dirty()
+
+        Clears the list of changed rows returned by RGBMatrix.dirty_rows().
+
+    .. py:attribute:: RGBMatrix.framebuffer
+
+        The framebuffer the drawing methods write to, the back buffer in double buffered mode. It is a list
+        of bytearray rows (array('H') rows when a color value needs more than 8 bits), a two dimensional
+        NumPy array with numpyBuffer or the packed scan ordered buffer of a PackedRGBMatrix. Rows changed
+        directly through it must be passed to RGBMatrix.mark_dirty() before they are displayed.
+
+    .. py:method:: RGBMatrix.mark_dirty(rows=None)
+
+        Marks the given framebuffer rows (an iterable of row numbers, all rows if None) as changed after
+        they were written directly through RGBMatrix.framebuffer, so the next refresh rebuilds their shift
+        data and RGBMatrix.dirty_rows() reports them.
+
+    .. py:method:: RGBMatrix.begin_frame(copy=True)
+
+        Starts drawing a new frame. The first call switches the matrix to double buffered mode, from
+        then on all drawing methods update an off-screen back buffer while RGBMatrix.refresh() keeps
+        displaying the front buffer, so partially drawn frames are never shown. If copy is True the back
+        buffer starts as a copy of the currently displayed frame (only rows that differ are copied),
+        otherwise it holds whatever was drawn two frames ago.
+
+    .. py:method:: RGBMatrix.swap(compare=True)
+
+        Makes the back buffer the displayed frame by swapping the front and back buffers, no pixel data
+        is copied. Only rows changed since RGBMatrix.begin_frame() have their shift data rebuilt and if
+        compare is True rows that were redrawn with identical contents are skipped as well. Call
+        RGBMatrix.begin_frame() before drawing the next frame.
+
+    .. py:method:: RGBMatrix.color(red,green=0,blue=0)
+
+        Returns the framebuffer color value for the given channel intensities. Each intensity can be 0
+        to 2^colordepth-1 and only as many channels as there are colors in rgbPins are used. With the
+        default colordepth of 1 this returns the familiar 0-7 color values.
+
     .. py:method:: RGBMatrix.value(row,col)
 
         Returns the color value currently being display at the (row,col) point.
@@ -124,6 +1267,88 @@ class RGBMatrix:
         performance advanage of using this method over the adafruit_gfx.gfx line method. To use the
         adafruit_gfx library with Micropython the Python source version should be downloaded from 
         github (https://github.com/adafruit/Adafruit_CircuitPython_GFX)
+        The line is clipped to the display before it is drawn, any part outside the display is skipped.
+
+    .. py:method:: RGBMatrix.hline(row,col,width,color=1)
+
+        Draws a horizontal line of width pixels starting at (row,col) and extending to the right. The
+        line is clipped to the display once and then written as a single run of the row, pixels outside
+        the display are silently skipped.
+
+    .. py:method:: RGBMatrix.vline(row,col,height,color=1)
+
+        Draws a vertical line of height pixels starting at (row,col) and extending downward, clipped to
+        the display.
+
+    .. py:method:: RGBMatrix.rect(row,col,height,width,color=1)
+
+        Draws the outline of a rectangle with its upper left corner at (row,col), clipped to the
+        display.
+
+    .. py:method:: RGBMatrix.fill_rect(row,col,height,width,color=1)
+
+        Draws a filled rectangle with its upper left corner at (row,col), clipped to the display. Each
+        row of the rectangle is written as a single run. The argument order of hline, vline and
+        fill_rect matches the adafruit_gfx primitives for a GFX object created with
+        (display.rows,display.cols,...), so the fast versions can be passed to GFX, see
+        examples/adafruit_gfx_example.py. As GFX treats its x coordinate as the row, the display's vline
+        is GFX's hline and the display's hline is GFX's vline.
+
+    .. py:method:: RGBMatrix.blit(bitmap,row,col,transparent=None,remap=None)
+
+        Copies a rectangular image onto the display with its upper left corner at (row,col). The bitmap
+        may be a Bitmap (including packed 1 or 3 bit per pixel bitmaps) or a list of equal length rows
+        such as bytearrays or memoryviews holding one color value per byte, or arrays (for example the
+        array('H') rows of a 16 bit framebuffer) or lists holding wider color values. The image is clipped
+        to the display once and then copied a row slice at a time. Pixels with the transparent color value
+        are left unchanged and remap may be a 256 byte table (or for wider color values any sequence
+        indexed by color value) used to translate the bitmap's color values before they are written.
+
+    .. py:method:: RGBMatrix.load_image(filename,row=0,col=0,srcrow=0,srccol=0,height=None,width=None)
+
+        Loads an uncompressed 1, 4, 8 or 24 bit BMP file or a binary PBM (P4), PGM (P5) or PPM (P6) file
+        onto the display with the source pixel (srcrow,srccol) at (row,col). height and width optionally
+        limit the region of the image that is loaded. The image is clipped to the display once and only
+        the needed rows are read, one at a time into the same small buffers, so the memory used does not
+        depend on the size of the file. Each row is quantized through a lookup table built from the
+        palette or the channel levels of the display's colordepth and written directly into the
+        framebuffer. White PBM pixels are lit in white. Returns the (rows,cols) size of the image.
+
+    .. py:method:: RGBMatrix.play(animation)
+
+        Draws the keyframe of an Animation and plays it. The next frame is applied at the start of each
+        refresh frame (RGBMatrix.refresh(), RGBMatrix.refresh_step() or RGBMatrix.run()) once the current
+        frame has been shown for its duration, so no other calls are needed to keep it running. Several
+        animations can be played at once in different regions of the display. The frames are written into
+        the framebuffer the application draws into, so animations can not be played in double buffered
+        mode (RGBMatrix.begin_frame()) or with the background refresh thread, RuntimeError is raised.
+
+    .. py:method:: RGBMatrix.stop_animation(animation=None)
+
+        Stops playing an animation, or every animation if none is given, leaving its current frame on
+        the display.
+
+    .. py:method:: RGBMatrix.scroll(drows,dcols,fill=0,wrap=False)
+
+        Moves the whole image drows rows down and dcols columns to the right (negative values move it up
+        or left) by shifting the framebuffer in place. Vertical scrolling just reorders the row buffers
+        and horizontal scrolling moves a slice within each row, so scrolling a ticker one pixel costs
+        about one memory move per row rather than redrawing it. Pixels scrolled onto the display are set
+        to the fill color, or with wrap set to True the image wraps around so the pixels scrolled off
+        one edge come back on the opposite edge. Only rows whose content changed are marked as changed.
+
+    .. py:method:: RGBMatrix.text(row,col,string,color=1,font=None)
+
+        Draws string with the top left corner of the first character at (row,col) and returns the column
+        following the last character drawn. The font is a BitmapFont and defaults to the built in 3x5
+        pixel FONT_3X5. A newline character starts a new line below the first character. Each glyph is
+        decoded into row spans once and cached, so redrawing text (clocks, tickers) writes whole spans
+        without decoding the font again. Text is clipped to the display.
+
+    .. py:method:: RGBMatrix.measure_text(string,font=None)
+
+        Returns the (rows,cols) size string would occupy if drawn with RGBMatrix.text, without drawing
+        it.
 
     .. py:method:: RGBMatrix.polygon(points, color=1)
 
@@ -131,6 +1356,11 @@ class RGBMatrix:
         a row,col pair. The method will draw a straight line betweeen each of the points and then a final
         straight line between the last point and the first point, closing the polygon.
 
+    .. py:method:: RGBMatrix.lines(segments,color=1)
+
+        Draws a batch of straight lines with a single call. Each segment is a (row0,col0,row1,col1)
+        tuple, optionally followed by a color which overrides the color argument for that segment.
+
     .. py:method:: RGBMatrix.circle(centrow,centcol,radius,color=1)
 
         Draws a circle of radius and color (0-7) centered at points (centrow,centcol). There is likely no 
@@ -138,76 +1368,376 @@ class RGBMatrix:
         adafruit_gfx library with Micropython the Python source version should be downloaded from 
         github (https://github.com/adafruit/Adafruit_CircuitPython_GFX)
 
+    .. py:method:: RGBMatrix.fill_polygon(points,color=1)
+
+        Draws a filled polygon using the same list of row,col points as RGBMatrix.polygon. The interior
+        is filled one row at a time with a scanline rasteriser using the even-odd rule, so concave and
+        self intersecting polygons are supported, and the outline is drawn as well. Unlike filling an
+        outline with RGBMatrix.fillarea the result does not depend on other pixels already on the
+        display.
+
+    .. py:method:: RGBMatrix.fill_circle(centrow,centcol,radius,color=1)
+
+        Draws a filled circle covering the same pixels as RGBMatrix.circle and its interior, writing
+        each row of the circle as a single span.
+
     .. py:method:: RGBMatrix.dump()
 
         Prints a matrix to the serial terminal representing the RGB matrix framebuffer.
 
     """
 
-    def __init__(self,rows,cols,addrPins,rgbPins,clockPin,latchPin,OEPin,unused_rgbPins=None):
-
-        if rows != 2 ** (len(addrPins)+1):
-            raise ValueError(f'A matrix with {rows} rows requires {len(bin(rows))-4} Address Pins')
+    _runlines = False           # True to draw every line as runs through _span and _vspan
+
+    def __init__(self,rows,cols,addrPins,rgbPins,clockPin,latchPin,OEPin,unused_rgbPins=None,backend=None,
+        colordepth=1,bcmTime=50,numpyBuffer=False,layout=None,dither=None):
+
+        panelRows = rows if layout is None else layout.panelRows
+        if panelRows != 2 ** (len(addrPins)+1):
+            raise ValueError(f'A matrix with {panelRows} rows requires {len(bin(panelRows))-4} Address Pins')
+        if layout is not None and (rows != layout.rows or cols != layout.cols):
+            raise ValueError(f'The panel layout requires {layout.rows} rows and {layout.cols} cols')
+        if colordepth < 1 or (len(rgbPins) // 2) * colordepth > 16:
+            raise ValueError(f'A colordepth of {colordepth} is not supported with {len(rgbPins)} RGB pins')
+        if numpyBuffer and numpy is None:
+            raise ValueError('A numpyBuffer requires the numpy module')
+        if dither not in (None,'ordered','diffusion'):
+            raise ValueError(f'Unknown dither mode {dither}, use ordered or diffusion')
+        if dither is not None and colordepth < 2:
+            raise ValueError('Dithering requires a colordepth greater than 1')
 
         self.rows = rows
         self.cols = cols
-        self._framebuffer = []
-        for i in range(self.rows):
-            self._framebuffer.append(bytearray(self.cols))
-
-        self._addrIO = []
-        self._rgbIO = []
-        self._unused_rgbIO = []
-
-        if implementation.name.upper() == "MICROPYTHON":
-            self._clockIO = Pin(clockPin,Pin.OUT)
-            self._latchIO = Pin(latchPin,Pin.OUT)
-            self._OEIO = Pin(OEPin,Pin.OUT)
-
-            for pin in addrPins:
-                self._addrIO.append(Pin(pin,Pin.OUT))
-                self._addrIO[-1].value(False)
-
-            for pin in rgbPins:
-                self._rgbIO.append(Pin(pin,Pin.OUT))
-                self._rgbIO[-1].value(False)
-
-            if unused_rgbPins != None:
-                for pin in unused_rgbPins:
-                    self._unused_rgbIO.append(Pin(pin,Pin.OUT))
-                    self._unused_rgbIO[-1].value(False)
+        self.colordepth = colordepth
+        self._bcmTime = bcmTime
+        self._numRGB = len(rgbPins) // 2
+        self._numpy = numpyBuffer
+        self._framebuffer = self._newbuffer()
+
+        if backend is None:
+            if implementation.name.upper() == "MICROPYTHON":
+                backend = MicroPythonPins()
+            else:
+                backend = CircuitPythonPins()
+        self._pins = backend
+        self._pins.setup(addrPins,rgbPins,clockPin,latchPin,OEPin,unused_rgbPins)
+
+        self._numAddrPins = len(addrPins)
+        self._updaterows = panelRows // 2
+        self._layout = layout
+        chainCols = cols
+        if layout is not None:
+            # Precomputed canvas runs feeding the upper and lower half of each scan row of the
+            # chain, and the canvas rows each scan row depends on
+            chainCols = layout.chainCols
+            self._scanmap = []
+            self._scandeps = []
+            for row in range(self._updaterows):
+                top = layout.segments(row)
+                bottom = layout.segments(row + self._updaterows)
+                deps = set()
+                for srow,scol,count,drow,dcol in top + bottom:
+                    for i in range(count):
+                        deps.add(srow + i*drow)
+                self._scanmap.append((top,bottom))
+                self._scandeps.append(bytes(sorted(deps)) if self.rows <= 256 else sorted(deps))
+
+        # Per scan row RGB pin state streams for each bit plane, rebuilt only when the framebuffer
+        # changes. The 1 bit refresh and sendrow use the most significant plane.
+        self._dither = dither
+        self._bcm = colordepth > 1 and dither is None
+        planes = colordepth
+        if dither is None:
+            self._planeluts = [self._pinlut(self._numRGB,colordepth,plane) for plane in range(colordepth)]
+            self._planehighluts = None
+            if self._numRGB * colordepth > 8:
+                self._planehighluts = [self._pinlut(self._numRGB,colordepth,plane,8) for plane in range(colordepth)]
         else:
-            self._clockIO = digitalio.DigitalInOut(getattr(board,clockPin))
-            self._clockIO.direction = digitalio.Direction.OUTPUT
-            self._latchIO = digitalio.DigitalInOut(getattr(board,latchPin))
-            self._latchIO.direction = digitalio.Direction.OUTPUT
-            self._OEIO = digitalio.DigitalInOut(getattr(board,OEPin))
-            self._OEIO.direction = digitalio.Direction.OUTPUT
-
-            for pin in addrPins:
-                self._addrIO.append(digitalio.DigitalInOut(getattr(board,pin)))
-                self._addrIO[-1].direction = digitalio.Direction.OUTPUT
-                self._addrIO[-1].value = False
-
-            for pin in rgbPins:
-                self._rgbIO.append(digitalio.DigitalInOut(getattr(board,pin)))
-                self._rgbIO[-1].direction = digitalio.Direction.OUTPUT
-                self._rgbIO[-1].value = False
-
-            if unused_rgbPins != None:
-                for pin in unused_rgbPins:
-                    self._unused_rgbIO.append(digitalio.DigitalInOut(getattr(board,pin)))
-                    self._unused_rgbIO[-1].direction = digitalio.Direction.OUTPUT
-                    self._unused_rgbIO[-1].value = False
-
-        self._numAddrPins = len(self._addrIO)
-        self._adrline = [0] * self._numAddrPins
-        self._numRGB = len(self._rgbIO) // 2
-        self._updaterows = self.rows // 2
+            # Temporal dithering instead holds the streams of 2^colordepth-1 one bit sub-frames,
+            # each refresh displays the next one through the 1 bit refresh path
+            planes = (1 << colordepth) - 1
+            self._dithermasks = self._dithertable(dither,colordepth)
+            self._planerepeat = [bytearray(self._updaterows) for i in range(planes)]
+            self._subframe = 0
+        self._planestreams = []
+        for plane in range(planes):
+            self._planestreams.append([bytearray(chainCols) for i in range(self._updaterows)])
+        self._streams = self._planestreams[-1]
+        self._repeat = bytearray(self._updaterows) if dither is None else self._planerepeat[-1]
+        self._dirty = bytearray(self.rows)
+
+        # Drawing goes to _framebuffer while the streams are built from _frontbuffer, they are the
+        # same buffer (and share the same dirty flags) until RGBMatrix.begin_frame() is called
+        self._frontbuffer = self._framebuffer
+        self._stale = self._dirty
+
+        self._shifted = -1          # scan row whose stream is held in the shift registers
+        self._nextrow = 0           # scan row refresh_step() resumes from
+        self._frameready = False    # refresh_step() already started the frame at _nextrow 0
+        self._brightness = 1
+        self._running = False
+        self._threaded = False
+        self._pending = None        # rows changed by a swap, waiting for the refresh thread
+        self._animations = []
 
         for i in range(rows):
             self.sendrow(i)
 
+    def _newbuffer(self):
+        if self._numpy:
+            dtype = numpy.uint16 if self._numRGB * self.colordepth > 8 else numpy.uint8
+            return numpy.zeros((self.rows,self.cols),dtype)
+        if self._numRGB * self.colordepth > 8:
+            return [array('H',[0] * self.cols) for i in range(self.rows)]
+        return [bytearray(self.cols) for i in range(self.rows)]
+
+    @staticmethod
+    def _pinlut(numRGB,depth,plane,shift=0):
+        # Maps one byte of a framebuffer color value (color bits shift to shift+7) to the upper half
+        # RGB pin bits of one bit plane, the lower half pin bits are the same values shifted up by
+        # numRGB. Colors wider than a byte OR together the bits of a low and a high byte table,
+        # which keeps every table at 256 bytes instead of one entry per color.
+        lut = bytearray(256)
+        for byte in range(256):
+            color = byte << shift
+            bits = 0
+            for i in range(numRGB):
+                if color & (1 << ((numRGB-1-i)*depth + plane)):
+                    bits |= 1 << i
+            lut[byte] = bits
+        return lut
+
+    @staticmethod
+    def _dithertable(mode,depth):
+        # masks[offset][value] has bit k set when a channel of that value is lit in sub-frame k,
+        # a value is lit in exactly value of the 2^depth-1 sub-frames. The offsets of the Bayer
+        # matrix shift the cycle of neighbouring pixels so they don't all flicker in step.
+        frames = (1 << depth) - 1
+        order = []                  # bit reversed sub-frame order spreads the lit sub-frames
+        for k in range(1,frames+1):
+            reverse = 0
+            for i in range(depth):
+                if k & (1 << i):
+                    reverse |= 1 << (depth-1-i)
+            order.append(reverse - 1)
+        masks = []
+        for offset in _BAYER4:
+            phase = offset * frames // 16
+            table = []
+            for value in range(frames+1):
+                mask = 0
+                error = phase
+                for k in range(frames):
+                    if mode == 'ordered':
+                        if order[(k + phase) % frames] < value:
+                            mask |= 1 << k
+                    else:
+                        # Error diffusion in time, the error of each sub-frame carries into the next
+                        error += value
+                        if error >= frames:
+                            error -= frames
+                            mask |= 1 << k
+                table.append(mask)
+            masks.append(table)
+        return masks
+
+    def _gather(self,segments):
+        fb = self._frontbuffer
+        pixels = []
+        for row,col,count,drow,dcol in segments:
+            if drow == 0:
+                if dcol > 0:
+                    pixels.extend(fb[row][col:col+count])
+                else:
+                    pixels.extend(fb[row][col-count+1:col+1][::-1])
+            else:
+                for i in range(count):
+                    pixels.append(fb[row + i*drow][col])
+        return pixels
+
+    def _buildstream(self,row):
+        if self._layout is None:
+            row2 = row + self._updaterows
+            top = self._frontbuffer[row]
+            bottom = self._frontbuffer[row2]
+            self._stale[row] &= ~_DIRTY_STREAM
+            self._stale[row2] &= ~_DIRTY_STREAM
+        else:
+            # The stale flags are cleared by _updatestreams(), a canvas row can feed several scan rows
+            top = self._gather(self._scanmap[row][0])
+            bottom = self._gather(self._scanmap[row][1])
+
+        if self._dither is not None:
+            self._ditherrow(row,top,bottom)
+            return
+
+        numRGB = self._numRGB
+        highluts = self._planehighluts
+        for plane in range(self.colordepth):
+            lut = self._planeluts[plane]
+            if self._numpy and self._layout is None:
+                lut = numpy.frombuffer(lut,numpy.uint8)
+                if highluts is None:
+                    bits = lut[top] | (lut[bottom] << numRGB)
+                else:
+                    high = numpy.frombuffer(highluts[plane],numpy.uint8)
+                    bits = lut[top & 0xff] | high[top >> 8] | ((lut[bottom & 0xff] | high[bottom >> 8]) << numRGB)
+                self._planestreams[plane][row][:] = bits.tobytes()
+            elif highluts is None:
+                self._planestreams[plane][row][:] = bytearray(lut[t] | (lut[b] << numRGB) for t,b in zip(top,bottom))
+            else:
+                high = highluts[plane]
+                self._planestreams[plane][row][:] = bytearray(lut[t & 0xff] | high[t >> 8] |
+                    ((lut[b & 0xff] | high[b >> 8]) << numRGB) for t,b in zip(top,bottom))
+
+        self._setrepeat(row)
+
+    def _ditherrow(self,row,top,bottom):
+        numRGB = self._numRGB
+        depth = self.colordepth
+        channel = (1 << depth) - 1
+        length = len(top)
+        frames = [bytearray(length) for k in range(len(self._planestreams))]
+        for panelrow,pixels,base in ((row,top,0),(row + self._updaterows,bottom,numRGB)):
+            offset = (panelrow & 3) << 2
+            masks = self._dithermasks[offset:offset+4]
+            for col in range(length):
+                color = pixels[col]
+                if not color:
+                    continue
+                table = masks[col & 3]
+                for i in range(numRGB):
+                    mask = table[(color >> ((numRGB-1-i)*depth)) & channel]
+                    bit = 1 << (base+i)
+                    k = 0
+                    while mask:
+                        if mask & 1:
+                            frames[k][col] |= bit
+                        mask >>= 1
+                        k += 1
+
+        for k in range(len(frames)):
+            streams = self._planestreams[k]
+            repeat = self._planerepeat[k]
+            streams[row][:] = frames[k]
+            repeat[row] = row > 0 and streams[row] == streams[row-1]
+            if row+1 < self._updaterows:
+                repeat[row+1] = streams[row+1] == streams[row]
+
+    def _setrepeat(self,row):
+        self._repeat[row] = row > 0 and self._streams[row] == self._streams[row-1]
+        if row+1 < self._updaterows:
+            self._repeat[row+1] = self._streams[row+1] == self._streams[row]
+
+    def _copyrow(self,dst,src,row):
+        dst[row][:] = src[row]
+
+    def _samerow(self,a,b,row):
+        if self._numpy:
+            return numpy.array_equal(a[row],b[row])
+        return a[row] == b[row]
+
+    def _updatestreams(self):
+        if self._animations:
+            # Advance the animations being played before the changed rows are rebuilt
+            self._animations = [animation for animation in self._animations if animation.update(self)]
+        if self._dither is not None:
+            # Every frame displays the next sub-frame of the dithering cycle
+            self._subframe = (self._subframe + 1) % len(self._planestreams)
+            self._streams = self._planestreams[self._subframe]
+            self._repeat = self._planerepeat[self._subframe]
+            self._shifted = -1
+        dirty = self._stale
+        half = self._updaterows
+        if self._layout is not None:
+            rebuild = [row for row in range(half) if any(dirty[dep] & _DIRTY_STREAM for dep in self._scandeps[row])]
+            if rebuild:
+                for row in range(self.rows):
+                    dirty[row] &= ~_DIRTY_STREAM
+                for row in rebuild:
+                    self._buildstream(row)
+                self._shifted = -1
+            return
+        for row in range(half):
+            if (dirty[row] | dirty[row+half]) & _DIRTY_STREAM:
+                self._buildstream(row)
+                self._shifted = -1
+
+    def begin_frame(self,copy=True):
+        if self._animations:
+            raise RuntimeError('Double buffering can not be used while an animation is playing')
+        if self._frontbuffer is self._framebuffer:
+            # Switch to double buffering, drawing now goes to an off-screen back buffer
+            self._framebuffer = self._newbuffer()
+            self._dirty = bytearray(self.rows)
+            for row in range(self.rows):
+                self._dirty[row] = _DIRTY_STREAM
+
+        # In double buffered mode the stream flag of a back buffer row is set when it may differ
+        # from the front buffer, so only those rows need to be copied
+        if copy:
+            front = self._frontbuffer
+            back = self._framebuffer
+            for row in range(self.rows):
+                if self._dirty[row] & _DIRTY_STREAM:
+                    self._copyrow(back,front,row)
+                    self._dirty[row] &= ~_DIRTY_STREAM
+
+    def swap(self,compare=True):
+        front = self._frontbuffer
+        back = self._framebuffer
+        if front is back:
+            return
+
+        changed = bytearray(self.rows)
+        dirty = self._dirty
+        for row in range(self.rows):
+            if dirty[row] & _DIRTY_STREAM:
+                if compare and self._samerow(back,front,row):
+                    dirty[row] &= ~_DIRTY_STREAM
+                else:
+                    changed[row] = _DIRTY_STREAM
+
+        if self._threaded:
+            # Hand the frame over to the refresh thread once it has finished with the last one,
+            # only the refresh thread updates the stream flags and rebuilds the streams
+            while self._pending is not None:
+                _yieldthread()
+            self._frontbuffer = back
+            self._pending = changed
+        else:
+            self._frontbuffer = back
+            self._markstale(changed)
+        self._framebuffer = front
+
+    def _markstale(self,changed):
+        stale = self._stale
+        for row in range(self.rows):
+            stale[row] |= changed[row]
+
+    def color(self,red,green=0,blue=0):
+        # Packs the channel intensities (0 to 2^colordepth-1) in rgbPins order into a color value
+        value = 0
+        for channel in (red,green,blue)[:self._numRGB]:
+            value = (value << self.colordepth) | channel
+        return value
+
+    def dirty_rows(self):
+        return [row for row in range(self.rows) if self._dirty[row] & _DIRTY_USER]
+
+    def clear_dirty(self):
+        for row in range(self.rows):
+            self._dirty[row] &= ~_DIRTY_USER
+
+    @property
+    def framebuffer(self):
+        return self._framebuffer
+
+    def mark_dirty(self,rows=None):
+        dirty = self._dirty
+        for row in range(self.rows) if rows is None else rows:
+            dirty[row] = _DIRTY_ALL
+
     def _seconds(self):
         if hasattr(adafruit_ticks,'ticks_ms'):
             return adafruit_ticks.ticks_ms() / 1000
@@ -215,21 +1745,13 @@ class RGBMatrix:
             return adafruit_ticks.monotonic_ns() / 1000000000
 
     def deinit(self):
+        self.stop()
         self.fill(0)
 
         del self._framebuffer
+        del self._frontbuffer
 
-        if implementation.name.upper() == "CIRCUITPYTHON":
-            self._clockIO.deinit()
-            self._latchIO.deinit()
-            self._OEIO.deinit()
-
-            for pin in self._addrIO:
-                pin.deinit()
-            for pin in self._rgbIO:
-                pin.deinit()
-            for pin in self._unused_rgbIO:
-                pin.deinit()
+        self._pins.deinit()
             
     def serial_bytes_available(self,timeout=1):
         # Does the same function as supervisor.runtime.serial_bytes_available
@@ -247,44 +1769,127 @@ class RGBMatrix:
         return retval
 
 
-    def fill(self,color,replace=None,swap=False):
-        for i in range(self.rows):
-            for j in range(self.cols):
-                if replace is None or self._framebuffer[i][j] == replace:
-                    self._framebuffer[i][j] = color
-                elif replace is not None and swap and self._framebuffer[i][j] == color:
-                    self._framebuffer[i][j] = replace
-            if color == 0 and replace is None:
-                self.sendrow(i)
+    def fill(self,color,replace=None,swap=False,bounds=None):
+        if bounds is None:
+            row1,col1,row2,col2 = 0,0,self.rows-1,self.cols-1
+        else:
+            row1,col1,row2,col2 = bounds
+            row1 = max(row1,0)
+            col1 = max(col1,0)
+            row2 = min(row2,self.rows-1)
+            col2 = min(col2,self.cols-1)
+            if row1 > row2 or col1 > col2:
+                return
+
+        fb = self._framebuffer
+        if self._numpy:
+            area = fb[row1:row2+1,col1:col2+1]
+            if replace is None:
+                area[:] = color
+                changed = range(row1,row2+1)
+            else:
+                mask = area == replace
+                swapmask = area == color
+                area[mask] = color
+                if swap:
+                    area[swapmask] = replace
+                    mask |= swapmask
+                changed = [row1 + i for i in numpy.flatnonzero(mask.any(axis=1))]
+        elif replace is None:
+            # Whole row slice assignment, effectively a memset per row
+            if isinstance(fb[0],bytearray):
+                pattern = bytes((color,)) * (col2-col1+1)
+            else:
+                pattern = array('H',[color] * (col2-col1+1))
+            for row in range(row1,row2+1):
+                fb[row][col1:col2+1] = pattern
+            changed = range(row1,row2+1)
+        else:
+            table = None
+            if isinstance(fb[0],bytearray) and replace < 256:
+                table = bytearray(range(256))
+                if swap:
+                    table[color] = replace
+                table[replace] = color
+            changed = []
+            for row in range(row1,row2+1):
+                old = fb[row][col1:col2+1]
+                if table is None:
+                    new = array('H',[color if v == replace else (replace if swap and v == color else v) for v in old])
+                else:
+                    try:
+                        new = old.translate(table)
+                    except AttributeError:      # MicroPython has no bytearray.translate
+                        new = bytearray(table[v] for v in old)
+                if new != old:
+                    fb[row][col1:col2+1] = new
+                    changed.append(row)
+
+        for row in changed:
+            self._dirty[row] = _DIRTY_ALL
+        if color == 0 and replace is None and bounds is None and not self._running:
+            # Blank the panel right away, the other scan rows are rebuilt by the next refresh
+            self.sendrow(0)
+
+    def _span(self,row,col0,col1,color):
+        buf = self._framebuffer[row]
+        if self._numpy:
+            buf[col0:col1+1] = color
+        elif isinstance(buf,bytearray):
+            buf[col0:col1+1] = bytes((color,)) * (col1-col0+1)
+        else:
+            for col in range(col0,col1+1):
+                buf[col] = color
+        self._dirty[row] = _DIRTY_ALL
+
+    def fillarea_spans(self,row,col,color=1):
+        # Scanline flood fill. Each stack entry is a range of columns (col0,col1) in a row, reached
+        # from the row in direction drow, whose background runs are filled in one go. Only the parts
+        # of a span overhanging its parent range are pushed back the other way.
+        value = self.value
+        blankcolor = value(row,col)
+        if blankcolor == color:
+            return
+        rows = self.rows
+        lastcol = self.cols - 1
+        stack = [(row,col,col,1),(row-1,col,col,-1)]
+        limit = 64
+        while stack:
+            if len(stack) > limit:
+                # Drop the ranges that have since been filled through another span, the stack only
+                # grows past the limit if that many ranges are still pending
+                stack = [entry for entry in stack if 0 <= entry[0] < rows and
+                    any(value(entry[0],col) == blankcolor for col in range(entry[1],entry[2]+1))]
+                limit = max(limit,2*len(stack))
+                continue
+            row,col0,col1,drow = stack.pop()
+            if not 0 <= row < rows:
+                continue
+            left = col0
+            if value(row,left) == blankcolor:
+                while left > 0 and value(row,left-1) == blankcolor:
+                    left -= 1
+                if left < col0:
+                    stack.append((row-drow,left,col0-1,-drow))
+            col = col0
+            while col <= col1:
+                while col <= lastcol and value(row,col) == blankcolor:
+                    col += 1
+                if col > left:
+                    self._span(row,left,col-1,color)
+                    stack.append((row+drow,left,col-1,drow))
+                    if col-1 > col1:
+                        stack.append((row-drow,col1+1,col-1,-drow))
+                    yield row
+                col += 1
+                while col < col1 and value(row,col) != blankcolor:
+                    col += 1
+                left = col
 
     def fillarea(self,row,col,color=1,animate=False,optimize=True):
-        if self._framebuffer[row][col] != color:
-            blankcolor = self._framebuffer[row][col]
+        for row in self.fillarea_spans(row,col,color):
             if animate:
-                pixmark = 0xf8 | color
-            else:
-                pixmark = 0xf8 | blankcolor
-            self._framebuffer[row][col] = pixmark
-            done = False
-            while not done:
-                done = True
-                for i in range(self.rows):
-                    for j in range(self.cols):
-                        if self._framebuffer[i][j] == pixmark:
-                            if self._framebuffer[max(0,i-1)][j] == blankcolor:
-                                self._framebuffer[max(0,i-1)][j] = pixmark
-                                done = False
-                            if self._framebuffer[min(self.rows-1,i+1)][j] == blankcolor:
-                                self._framebuffer[min(self.rows-1,i+1)][j] = pixmark
-                                done = False
-                            if self._framebuffer[i][max(0,j-1)] == blankcolor:
-                                self._framebuffer[i][max(0,j-1)] = pixmark
-                                done = False
-                            if self._framebuffer[i][min(self.cols-1,j+1)] == blankcolor:
-                                self._framebuffer[i][min(self.cols-1,j+1)] = pixmark
-                                done = False
                 self.refresh(optimize=optimize)
-            self.fill(color,pixmark)
 
     def input(self,prompt=None,optimize=True,silent=False):
 
@@ -300,186 +1905,288 @@ class RGBMatrix:
             self.refresh(optimize)
         
             if self.serial_bytes_available():
-                try:
-                    keys += stdin.read(1)
-                    if keys[-1] in ['\x7f','\x08']:
-                        keys = keys[:-2]
-                        if not silent:
-                            print('\x08'+'  \x08\x08',end="")
-                    else:
-                        if not silent:
-                            print(keys[-1],end="")
-                except:
-                    pass
+                keys = self._readkey(keys,silent)
 
         return keys[:-1]
 
+    def _readkey(self,keys,silent):
+        try:
+            keys += stdin.read(1)
+            if keys[-1] in ['\x7f','\x08']:
+                keys = keys[:-2]
+                if not silent:
+                    print('\x08'+'  \x08\x08',end="")
+            else:
+                if not silent:
+                    print(keys[-1],end="")
+        except:
+            pass
+        return keys
+
     def sleep(self,seconds,optimize=True):
         timerEnd = self._seconds() + seconds
         while self._seconds() < timerEnd:
             self.refresh(optimize)
 
-    def off(self):
-        if implementation.name.upper() == "CIRCUITPYTHON":
-            self._OEIO.value = True     # display off
-        else:
-            self._OEIO.value(True)
-
-    def refresh(self,optimize=True):
+    async def run(self,refresh_hz=None,rows=4,optimize=True):
+        # Cooperative refresh task, yields to other coroutines after every slice of rows
         rowrange = 1 << self._numAddrPins
-        if implementation.name.upper() == "CIRCUITPYTHON":
-            for row in range(rowrange):
-                row2 = row + rowrange
-
-                # If row is different than previous
-                if not optimize or row == 0 or self._framebuffer[row] != self._framebuffer[row-1] or \
-                    self._framebuffer[row2] != self._framebuffer[row2-1]:
-
-                    for col in range(self.cols):         # shift in row bits
-                        shft = 1 << (self._numRGB-1)
-                        self._rgbIO[0].value = self._framebuffer[row][col] & shft
-                        self._rgbIO[self._numRGB].value = self._framebuffer[row2][col] & shft
-                        if shft > 1:
-                            shft >>= 1
-                            self._rgbIO[1].value = self._framebuffer[row][col] & shft
-                            self._rgbIO[1+self._numRGB].value = self._framebuffer[row2][col] & shft
-                            if shft > 1:
-                                shft = 1
-                                self._rgbIO[2].value = self._framebuffer[row][col] & shft
-                                self._rgbIO[2+self._numRGB].value = self._framebuffer[row2][col] & shft
-                        self._clockIO.value = True
-                        self._clockIO.value = False
-
-                self._OEIO.value = True                 # display off
-
-                self._latchIO.value = True       # latch new row
-                self._latchIO.value = False
-
-                for i in range(self._numAddrPins):      # move to new row
-                    self._addrIO[i].value = self._adrline[i]
-
-                self._OEIO.value = False             # display on
-
-                # Binary increment of address lines
-                self._adrline[0] = not self._adrline[0]
-                for i in range(1,self._numAddrPins):
-                    if not self._adrline[i-1]:
-                        self._adrline[i] = not self._adrline[i]
-                    else:
-                        break
-
-        else: # Micropython
-            
-            for row in range(rowrange):
-                row2 = row + rowrange
-
-                # If row is different than previous
-                if not optimize or row == 0 or self._framebuffer[row] != self._framebuffer[row-1] or \
-                    self._framebuffer[row2] != self._framebuffer[row2-1]:
-
-                    for col in range(self.cols):         # shift in row bits
-                        shft = 1 << (self._numRGB-1)
-                        self._rgbIO[0].value(self._framebuffer[row][col] & shft)
-                        self._rgbIO[self._numRGB].value(self._framebuffer[row2][col] & shft)
-                        if shft > 1:
-                            shft >>= 1
-                            self._rgbIO[1].value(self._framebuffer[row][col] & shft)
-                            self._rgbIO[1+self._numRGB].value(self._framebuffer[row2][col] & shft)
-                            if shft > 1:
-                                shft = 1
-                                self._rgbIO[2].value(self._framebuffer[row][col] & shft)
-                                self._rgbIO[2+self._numRGB].value(self._framebuffer[row2][col] & shft)
-                        self._clockIO.value(True)
-                        self._clockIO.value(False)
-
-                self._OEIO.value(True)                 # display off
-
-                self._latchIO.value(True)       # latch new row
-                self._latchIO.value(False)
-
-                for i in range(self._numAddrPins):      # move to new row
-                    self._addrIO[i].value(adrline[i])
-
-                self._OEIO.value(False)             # display on
-
-                # Binary increment of address lines
-                adrline[0] = not adrline[0]
-                for i in range(1,self._numAddrPins):
-                    if not adrline[i-1]:
-                        adrline[i] = not adrline[i]
-                    else:
-                        break
-            
+        rows = max(1,min(rows,rowrange))
+        pins = self._pins
+        self._running = True
+        while self._running:
+            start = _ticks_us()
+            for first in range(0,rowrange,rows):
+                if first == 0:
+                    self._updatestreams()
+                if not self._bcm and self._shifted >= 0 and self._brightness > 0:
+                    # Relight the row latched before the task yielded, like every other row it is
+                    # displayed while the next row is shifted in
+                    pins.enable(True)
+                self._refreshrows(first,min(rows,rowrange-first),optimize)
+                # Keep the last row of the slice from staying lit while other coroutines run
+                pins.enable(False)
+                if refresh_hz:
+                    # Spread any time left in the frame evenly between the row slices
+                    due = (1000000 * min(first+rows,rowrange)) // (refresh_hz * rowrange)
+                    wait = due - _ticks_diff(_ticks_us(),start)
+                    await asyncio.sleep(wait / 1000000 if wait > 0 else 0)
+                else:
+                    await asyncio.sleep(0)
+
+    def start_background_refresh(self,optimize=True):
+        if _thread is None:
+            raise RuntimeError('Threads are not supported on this platform')
+        if self._running:
+            return
+        if self._animations:
+            raise RuntimeError('The background refresh can not be used while an animation is playing')
+        self._running = True
+        self._threaded = True
+        _thread.start_new_thread(self._refreshthread,(optimize,))
+
+    def _refreshthread(self,optimize):
+        try:
+            while self._running:
+                changed = self._pending
+                if changed is not None:
+                    self._markstale(changed)
+                self.refresh(optimize)
+                if changed is not None:
+                    self._pending = None
+        finally:
+            self._threaded = False
+
+    def stop(self):
+        self._running = False
+        while self._threaded:       # wait for the refresh thread to finish its last frame
+            _yieldthread()
+        if self._pending is not None:
+            self._markstale(self._pending)
+            self._pending = None
+
+    async def sleep_async(self,seconds,optimize=True):
+        if self._running:
+            await asyncio.sleep(seconds)
+        else:
+            timerEnd = self._seconds() + seconds
+            while self._seconds() < timerEnd:
+                self.refresh(optimize)
+                await asyncio.sleep(0)
 
-    def sendrow(self,row):
-        if implementation.name.upper() == "CIRCUITPYTHON":
-            self._OEIO.value = False
+    async def input_async(self,prompt=None,optimize=True,silent=False):
 
-            if row < self._updaterows:
-                row1 = row
-                row2 = row + (self._updaterows)
-            else:
-                row1 = row - (self._updaterows)
-                row2 = row
+        while self.serial_bytes_available(0):
+            stdin.read(1)
 
-            for j in range(self.cols):
-                shft = 1 << (self._numRGB-1)
-                self._rgbIO[0].value = self._framebuffer[row][j] & shft
-                self._rgbIO[self._numRGB].value = self._framebuffer[row2][j] & shft
-                if shft > 1:
-                    shft >>= 1
-                    self._rgbIO[1].value = self._framebuffer[row][j] & shft
-                    self._rgbIO[1+self._numRGB].value = self._framebuffer[row2][j] & shft
-                    if shft > 1:
-                        shft = 1
-                        self._rgbIO[2].value = self._framebuffer[row][j] & shft
-                        self._rgbIO[2+self._numRGB].value = self._framebuffer[row2][j] & shft
-                self._clockIO.value = True
-                self._clockIO.value = False
-
-            self._OEIO.value = True
+        if prompt != None:
+            print(prompt,end="")
 
-            for i in range(self._numAddrPins):
-                self._addrIO[i].value = (row) & (1<<i)
+        keys = ""
 
-            self._latchIO.value = True
-            self._latchIO.value = False
+        while keys[-1:] != '\n':
+            if not self._running:
+                self.refresh(optimize)
+            await asyncio.sleep(0)
 
-            self._OEIO.value = False
-        else:     # Micropython
-            self._OEIO.value(False)
+            if self.serial_bytes_available(0):
+                keys = self._readkey(keys,silent)
 
-            if row < self._updaterows:
-                row1 = row
-                row2 = row + (self._updaterows)
-            else:
-                row1 = row - (self._updaterows)
-                row2 = row
+        return keys[:-1]
 
-            for j in range(self.cols):
-                shft = 1 << (self._numRGB-1)
-                self._rgbIO[0].value(self._framebuffer[row][j] & shft)
-                self._rgbIO[self._numRGB].value(self._framebuffer[row2][j] & shft)
-                if shft > 1:
-                    shft >>= 1
-                    self._rgbIO[1].value(self._framebuffer[row][j] & shft)
-                    self._rgbIO[1+self._numRGB].value(self._framebuffer[row2][j] & shft)
-                    if shft > 1:
-                        shft = 1
-                        self._rgbIO[2].value(self._framebuffer[row][j] & shft)
-                        self._rgbIO[2+self._numRGB].value(self._framebuffer[row2][j] & shft)
-                self._clockIO.value(True)
-                self._clockIO.value(False)
-
-            self._OEIO.value(True)
+    def off(self):
+        self._pins.enable(False)     # display off
+
+    @property
+    def brightness(self):
+        return self._brightness
+
+    @brightness.setter
+    def brightness(self,value):
+        self._brightness = min(max(value,0),1)
+
+    def enable_stats(self,callback=None):
+        if isinstance(self._pins,_StatsPins):
+            self._pins.callback = callback
+            self._pins.reset()
+            return
+        self._pins = _StatsPins(self._pins,self._updaterows,callback)
+        self.refresh = self._timedcall(self.refresh)
+        self.refresh_step = self._timedcall(self.refresh_step)
+
+    def _timedcall(self,method):
+        pins = self._pins
+        def call(*args,**kwargs):
+            pins.called()
+            result = method(*args,**kwargs)
+            pins.returned()
+            return result
+        return call
+
+    def disable_stats(self):
+        if isinstance(self._pins,_StatsPins):
+            self._pins = self._pins._backend
+            del self.refresh
+            del self.refresh_step
+
+    def stats(self):
+        if isinstance(self._pins,_StatsPins):
+            return self._pins.stats()
+        return None
+
+    def reset_stats(self):
+        if isinstance(self._pins,_StatsPins):
+            self._pins.reset()
 
-            for i in range(self._numAddrPins):
-                self._addrIO[i].value((row) & (1<<i))
+    def refresh(self,optimize=True):
+        self._updatestreams()
+        dimmed = not self._bcm and self._brightness < 1
+        if dimmed and self._shifted >= 0 and self._brightness > 0:
+            # Relight the row latched when the last call returned, it is displayed while the
+            # first row is shifted in like every other row
+            self._pins.enable(True)
+        self._refreshrows(0,1 << self._numAddrPins,optimize)
+        if dimmed:
+            # Don't let the last row stay lit at full duty while the caller does other work
+            self._pins.enable(False)
+
+    def refresh_step(self,budget_us,optimize=True):
+        start = _ticks_us()
+        pins = self._pins
+        rowrange = 1 << self._numAddrPins
+        row = self._nextrow
+        if row == 0 and not self._frameready:
+            self._updatestreams()
+        if not self._bcm and self._shifted >= 0 and self._brightness > 0:
+            # The display was turned off when the last step ended, relight the latched row so
+            # it is displayed while the next row is shifted in just like every other row
+            pins.enable(True)
+
+        count = 0
+        while True:
+            self._refreshrows(row,1,optimize)
+            self._frameready = False
+            count += 1
+            row += 1
+            if row == rowrange:
+                row = 0
+                pins.enable(False)          # don't let a stream rebuild lengthen the last row
+                self._updatestreams()
+                self._frameready = True     # the next step mustn't start the frame again
+                if not self._bcm and self._brightness > 0:
+                    pins.enable(True)
+            elapsed = _ticks_diff(_ticks_us(),start)
+            if elapsed + elapsed // count > budget_us:
+                break
+
+        # Keep the last row from staying lit (and brighter) while the caller does other work
+        pins.enable(False)
+        self._nextrow = row
+        return count
+
+    def _refreshrows(self,first,count,optimize=True):
+        if self._bcm:
+            self._refreshbcm(first,count)
+            return
+        if self._brightness < 1:
+            self._refreshdimmed(first,count,optimize)
+            return
+
+        pins = self._pins
+        streams = self._streams
+        repeat = self._repeat
+        shifted = self._shifted
+        for row in range(first,first+count):
+
+            # If row is different than the one already in the shift registers
+            if not optimize or not repeat[row] or shifted != row-1:
+                pins.shift(streams[row])    # shift in row bits
+
+            pins.enable(False)          # display off
+            pins.latch()                # latch new row
+            pins.address(row)           # move to new row
+            pins.enable(True)           # display on
+            shifted = row
+        self._shifted = shifted
+
+    def _refreshdimmed(self,first,count,optimize=True):
+        # A row is lit only while the first part of the next row is shifted in and is dark for
+        # the rest of the shift, so the row period (and the refresh rate) is the same at every
+        # brightness and the shift itself times the on period. Repeated rows are shifted in too,
+        # skipping the shift would leave the row before them dark.
+        pins = self._pins
+        streams = self._streams
+        length = len(streams[0])
+        lit = int(self._brightness * length + 0.5)
+        for row in range(first,first+count):
+            stream = memoryview(streams[row])
+            if lit:
+                pins.shift(stream[:lit])
+            pins.enable(False)
+            if lit < length:
+                pins.shift(stream[lit:])
+
+            pins.latch()
+            pins.address(row)
+            if lit:
+                pins.enable(True)
+        self._shifted = first+count-1
+
+    def _refreshbcm(self,first,count):
+        # Binary Code Modulation, bit plane k of each row is displayed for bcmTime * 2^k microseconds.
+        # The panel is dark while a plane is shifted in so the shift time doesn't skew the weights.
+        pins = self._pins
+        planestreams = self._planestreams
+        bcmTime = self._bcmTime
+        brightness = self._brightness
+        for row in range(first,first+count):
+            for plane in range(self.colordepth):
+                pins.shift(planestreams[plane][row])
+                pins.latch()
+                pins.address(row)
+                ontime = bcmTime << plane
+                lit = int(ontime * brightness)
+                if lit:
+                    pins.enable(True)
+                start = _ticks_us()
+                while _ticks_diff(_ticks_us(),start) < lit:
+                    pass
+                pins.enable(False)
+                # Dimmed planes stay dark for the rest of their time to keep the refresh rate
+                while _ticks_diff(_ticks_us(),start) < ontime:
+                    pass
 
-            self._latchIO.value(True)
-            self._latchIO.value(False)
+    def sendrow(self,row):
+        row1 = row % self._updaterows
 
-            self._OEIO.value(False)
+        self._buildstream(row1)
+        self._shifted = row1
+        self._pins.enable(True)
+        self._pins.shift(self._streams[row1])
+        self._pins.enable(False)
+        self._pins.address(row1)
+        self._pins.latch()
+        self._pins.enable(True)
 
     def value(self,row,col):
         return self._framebuffer[row][col]
@@ -487,9 +2194,385 @@ class RGBMatrix:
     def point(self,row,col,color=1):
         try:
             self._framebuffer[row][col] = color
+            self._dirty[row] = _DIRTY_ALL
         except:
             print(f'Bad row,col ({row},{col})')
 
+    def _vspan(self,col,row0,row1,color):
+        fb = self._framebuffer
+        dirty = self._dirty
+        for row in range(row0,row1+1):
+            fb[row][col] = color
+            dirty[row] = _DIRTY_ALL
+
+    def hline(self,row,col,width,color=1):
+        if 0 <= row < self.rows:
+            col0 = max(col,0)
+            col1 = min(col+width,self.cols) - 1
+            if col0 <= col1:
+                self._span(row,col0,col1,color)
+
+    def vline(self,row,col,height,color=1):
+        if 0 <= col < self.cols:
+            row0 = max(row,0)
+            row1 = min(row+height,self.rows) - 1
+            if row0 <= row1:
+                self._vspan(col,row0,row1,color)
+
+    def rect(self,row,col,height,width,color=1):
+        if height > 0 and width > 0:
+            self.hline(row,col,width,color)
+            self.hline(row+height-1,col,width,color)
+            self.vline(row+1,col,height-2,color)
+            self.vline(row+1,col+width-1,height-2,color)
+
+    def fill_rect(self,row,col,height,width,color=1):
+        row0 = max(row,0)
+        row1 = min(row+height,self.rows) - 1
+        col0 = max(col,0)
+        col1 = min(col+width,self.cols) - 1
+        if col0 <= col1:
+            for row in range(row0,row1+1):
+                self._span(row,col0,col1,color)
+
+    @staticmethod
+    def _clipline(major0,minor0,dmajor,dminor,inc,majormax,minormax):
+        # Returns the first and last step of a Bresenham line whose pixel lies on the display,
+        # or None. After k steps the minor axis has moved (2*dminor*k + dmajor - 1) // (2*dmajor)
+        # times, which only ever grows, so the bounds of the minor axis are found by bisection.
+        minor1 = minor0 + inc*dminor
+        if 0 <= major0 and major0+dmajor <= majormax and 0 <= min(minor0,minor1) and max(minor0,minor1) <= minormax:
+            return 0,dmajor,minor0,2*dminor - dmajor
+
+        first = max(0,-major0)
+        last = min(dmajor,majormax-major0)
+        if inc > 0:
+            low = -minor0
+            high = minormax - minor0
+        else:
+            low = minor0 - minormax
+            high = minor0
+        den = 2*dmajor
+        lo,hi = first,last+1
+        while lo < hi:
+            mid = (lo+hi) // 2
+            if (2*dminor*mid + dmajor - 1) // den >= low:
+                hi = mid
+            else:
+                lo = mid + 1
+        first = lo
+        lo,hi = first-1,last
+        while lo < hi:
+            mid = (lo+hi+1) // 2
+            if (2*dminor*mid + dmajor - 1) // den <= high:
+                lo = mid
+            else:
+                hi = mid - 1
+        last = lo
+        if first > last:
+            return None
+        moves = (2*dminor*first + dmajor - 1) // den
+        return first,last,minor0 + inc*moves,2*dminor*(first+1) - dmajor - den*moves
+
+    def _blitspan(self,row,col,pixels):
+        buf = self._framebuffer[row]
+        if self._numpy:
+            dtype = numpy.uint16 if isinstance(pixels,array) else numpy.uint8
+            buf[col:col+len(pixels)] = numpy.frombuffer(bytes(pixels),dtype)
+        elif isinstance(buf,bytearray):
+            buf[col:col+len(pixels)] = bytes(list(pixels)) if isinstance(pixels,array) else pixels
+        else:
+            buf[col:col+len(pixels)] = array('H',list(pixels))
+        self._dirty[row] = _DIRTY_ALL
+
+    def blit(self,bitmap,row,col,transparent=None,remap=None):
+        if isinstance(bitmap,Bitmap):
+            height = bitmap.rows
+            width = bitmap.cols
+            source = bitmap.row
+        else:
+            height = len(bitmap)
+            width = len(bitmap[0]) if height else 0
+            source = bitmap.__getitem__
+
+        # Clip the bitmap against the display once
+        row0 = max(0,-row)
+        row1 = min(height,self.rows-row)
+        col0 = max(0,-col)
+        col1 = min(width,self.cols-col)
+        if row0 >= row1 or col0 >= col1:
+            return
+
+        for srcrow in range(row0,row1):
+            line = source(srcrow)
+            wide = not isinstance(line,(bytes,bytearray,memoryview)) or getattr(line,'itemsize',1) != 1
+            if wide:
+                # Rows of wider color values (such as the array('H') rows of a 16 bit framebuffer)
+                # keep their values
+                pixels = array('H',line[col0:col1])
+            else:
+                pixels = bytes(line[col0:col1])
+            if transparent is None:
+                runs = ((0,len(pixels)),)
+            elif wide:
+                runs = []
+                start = 0
+                while start < len(pixels):
+                    if pixels[start] == transparent:
+                        start += 1
+                        continue
+                    end = start + 1
+                    while end < len(pixels) and pixels[end] != transparent:
+                        end += 1
+                    runs.append((start,end))
+                    start = end
+            else:
+                # Runs of opaque pixels, the transparent color is matched before any remapping
+                runs = []
+                clear = bytes((transparent,))
+                start = 0
+                while start < len(pixels):
+                    if pixels[start] == transparent:
+                        start += 1
+                        continue
+                    end = pixels.find(clear,start)
+                    if end < 0:
+                        end = len(pixels)
+                    runs.append((start,end))
+                    start = end
+            for start,end in runs:
+                run = pixels[start:end]
+                if remap is not None and wide:
+                    run = array('H',[remap[v] for v in run])
+                elif remap is not None:
+                    try:
+                        run = run.translate(remap)
+                    except AttributeError:      # MicroPython has no bytes.translate
+                        run = bytes(remap[v] for v in run)
+                self._blitspan(row+srcrow,col+col0+start,run)
+
+    def _levels(self,maxval,channel):
+        # Maps a sample from 0 to maxval of a color channel (0 red, 1 green, 2 blue) to the
+        # nearest channel intensity already shifted into place in a framebuffer color value
+        if channel >= self._numRGB:
+            return [0] * (maxval+1)
+        top = (1 << self.colordepth) - 1
+        shift = (self._numRGB-1-channel) * self.colordepth
+        return [((value*top*2 + maxval) // (2*maxval)) << shift for value in range(maxval+1)]
+
+    def _bmpheader(self,f):
+        offset = struct.unpack('<I',f.read(12)[8:])[0]
+        dibsize = struct.unpack('<I',f.read(4))[0]
+        header = f.read(dibsize-4)
+        if dibsize == 12:
+            imgcols,imgrows,planes,bpp = struct.unpack('<HHHH',header[:8])
+            compression = 0
+            colors = 0
+            entry = 3
+        else:
+            imgcols,imgrows,planes,bpp,compression = struct.unpack('<iiHHI',header[:16])
+            colors = struct.unpack('<I',header[28:32])[0]
+            entry = 4
+        if compression != 0 or bpp not in (1,4,8,24):
+            raise ValueError('Only uncompressed 1, 4, 8 and 24 bit BMP files are supported')
+        topdown = imgrows < 0
+        imgrows = abs(imgrows)
+
+        if bpp == 24:
+            lut = (self._levels(255,2),self._levels(255,1),self._levels(255,0))
+        else:
+            # Quantize the palette once, each pixel is then a single lookup
+            red,green,blue = (self._levels(255,0),self._levels(255,1),self._levels(255,2))
+            palette = f.read(entry * (colors or 1 << bpp))
+            lut = [red[palette[i+2]] | green[palette[i+1]] | blue[palette[i]] for i in range(0,len(palette),entry)]
+            lut.extend([0] * (256-len(lut)))
+        stride = ((imgcols*bpp + 31) // 32) * 4
+        return imgrows,imgcols,offset,stride,topdown,bpp,lut
+
+    def _pnmheader(self,f,magic):
+        fields = []
+        token = b''
+        while len(fields) < (2 if magic == b'P4' else 3):
+            char = f.read(1)
+            if not char:
+                raise ValueError('Truncated PBM/PGM/PPM header')
+            if char == b'#':
+                while char not in (b'\n',b''):
+                    char = f.read(1)
+            elif char in b' \t\r\n':
+                if token:
+                    fields.append(int(token))
+                    token = b''
+            else:
+                token += char
+        imgcols,imgrows = fields[:2]
+        if magic == b'P4':
+            top = (1 << self.colordepth) - 1
+            return imgrows,imgcols,f.tell(),(imgcols+7) // 8,True,1,[self.color(top,top,top),0]
+        maxval = fields[2]
+        if maxval > 255:
+            raise ValueError('Only PGM and PPM files with 8 bit samples are supported')
+        if magic == b'P5':
+            red,green,blue = (self._levels(maxval,0),self._levels(maxval,1),self._levels(maxval,2))
+            lut = [red[value] | green[value] | blue[value] for value in range(maxval+1)]
+            lut.extend([0] * (256-len(lut)))
+            return imgrows,imgcols,f.tell(),imgcols,True,8,lut
+        lut = tuple(self._levels(maxval,channel) + [0] * (255-maxval) for channel in range(3))
+        return imgrows,imgcols,f.tell(),imgcols*3,True,24,lut
+
+    def load_image(self,filename,row=0,col=0,srcrow=0,srccol=0,height=None,width=None):
+        with open(filename,'rb') as f:
+            magic = f.read(2)
+            if magic == b'BM':
+                image = self._bmpheader(f)
+            elif magic in (b'P4',b'P5',b'P6'):
+                image = self._pnmheader(f,magic)
+            else:
+                raise ValueError(f'{filename} is not a BMP, PBM, PGM or PPM file')
+            imgrows,imgcols,offset,stride,topdown,bpp,lut = image
+
+            # Clip the source region against the image and the display once
+            row1 = imgrows if height is None else min(imgrows,srcrow+height)
+            col1 = imgcols if width is None else min(imgcols,srccol+width)
+            row0 = max(srcrow,srcrow-row,0)
+            row1 = min(row1,srcrow+self.rows-row)
+            col0 = max(srccol,srccol-col,0)
+            col1 = min(col1,srccol+self.cols-col)
+            if row0 < row1 and col0 < col1:
+                # Only the bytes of the clipped columns are read, one row at a time into the same buffers
+                first = col0*bpp // 8
+                raw = bytearray((col1*bpp + 7) // 8 - first)
+                count = col1 - col0
+                if self._numRGB * self.colordepth > 8:
+                    pixels = array('H',[0] * count)
+                else:
+                    pixels = bytearray(count)
+                translate = bpp == 8 and isinstance(pixels,bytearray) and bytes(lut)
+                for y in range(row0,row1):
+                    f.seek(offset + (y if topdown else imgrows-1-y)*stride + first)
+                    f.readinto(raw)
+                    if translate:
+                        try:
+                            pixels[:] = raw.translate(translate)
+                        except AttributeError:      # MicroPython has no bytearray.translate
+                            for i in range(count):
+                                pixels[i] = lut[raw[i]]
+                    elif bpp == 24:
+                        lut0,lut1,lut2 = lut
+                        for i in range(count):
+                            pixels[i] = lut0[raw[3*i]] | lut1[raw[3*i+1]] | lut2[raw[3*i+2]]
+                    else:
+                        mask = (1 << bpp) - 1
+                        for i in range(count):
+                            bit = (col0+i)*bpp
+                            pixels[i] = lut[(raw[(bit >> 3) - first] >> (8 - bpp - (bit & 7))) & mask]
+                    self._blitspan(row+y-srcrow,col+col0-srccol,pixels)
+        return imgrows,imgcols
+
+    def play(self,animation):
+        # Deltas are applied to the framebuffer from the refresh, which would be the back buffer in
+        # double buffered mode and drawn into by another thread in threaded mode
+        if self._frontbuffer is not self._framebuffer or self._threaded:
+            raise RuntimeError('Animations can not be played in double buffered or threaded mode')
+        animation.start(self)
+        if animation not in self._animations:
+            self._animations.append(animation)
+
+    def stop_animation(self,animation=None):
+        if animation is None:
+            self._animations = []
+        elif animation in self._animations:
+            self._animations.remove(animation)
+
+    def scroll(self,drows,dcols,fill=0,wrap=False):
+        fb = self._framebuffer
+        rows = self.rows
+        cols = self.cols
+        if self._numpy:
+            old = fb.copy()
+            if wrap:
+                fb[:] = numpy.roll(old,(drows,dcols),(0,1))
+            else:
+                fb[:] = fill
+                if abs(drows) < rows and abs(dcols) < cols:
+                    fb[max(drows,0):rows+min(drows,0),max(dcols,0):cols+min(dcols,0)] = \
+                        old[max(-drows,0):rows+min(-drows,0),max(-dcols,0):cols+min(-dcols,0)]
+            for row in numpy.flatnonzero((old != fb).any(axis=1)):
+                self._dirty[row] = _DIRTY_ALL
+            return
+
+        if isinstance(fb[0],bytearray):
+            pattern = bytes((fill,)) * cols
+        else:
+            pattern = array('H',[fill] * cols)
+
+        if drows:
+            # Vertical scrolling only reorders the row buffers, rows scrolled off the display
+            # are reused (cleared to fill) for the rows scrolled on
+            old = list(fb)
+            order = []
+            for row in range(rows):
+                src = row - drows
+                if wrap:
+                    order.append(old[src % rows])
+                elif 0 <= src < rows:
+                    order.append(old[src])
+                else:
+                    order.append(None)
+            used = set(id(buf) for buf in order if buf is not None)
+            spare = [buf for buf in old if id(buf) not in used]
+            for row in range(rows):
+                buf = order[row]
+                if buf is None:
+                    if old[row] != pattern:
+                        self._dirty[row] = _DIRTY_ALL
+                    order[row] = spare.pop()
+                elif buf is not old[row] and buf != old[row]:
+                    self._dirty[row] = _DIRTY_ALL
+            for buf in order:
+                if id(buf) not in used:
+                    buf[:] = pattern
+            fb[:] = order
+
+        if dcols:
+            # Horizontal scrolling moves a slice within each row, a row only stays the same if
+            # it is a single color
+            for row in range(rows):
+                buf = fb[row]
+                if wrap:
+                    shift = dcols % cols
+                    if buf[:cols-1] != buf[1:]:
+                        buf[:] = buf[cols-shift:] + buf[:cols-shift]
+                        self._dirty[row] = _DIRTY_ALL
+                elif buf != pattern:
+                    if dcols >= cols or -dcols >= cols:
+                        buf[:] = pattern
+                    elif dcols > 0:
+                        buf[dcols:] = buf[:cols-dcols]
+                        buf[:dcols] = pattern[:dcols]
+                    else:
+                        buf[:cols+dcols] = buf[-dcols:]
+                        buf[cols+dcols:] = pattern[:-dcols]
+                    self._dirty[row] = _DIRTY_ALL
+
+    def text(self,row,col,string,color=1,font=None):
+        if font is None:
+            font = FONT_3X5
+        start = col
+        for char in string:
+            if char == '\n':
+                row += font.height + 1
+                col = start
+                continue
+            spans = font.spans(char)
+            for i in range(0,len(spans),3):
+                self.hline(row+spans[i],col+spans[i+1],spans[i+2]-spans[i+1]+1,color)
+            col += font.width(char) + font.spacing
+        return col - font.spacing if string else col
+
+    def measure_text(self,string,font=None):
+        return (font or FONT_3X5).measure(string)
+
     def _plotLineLow(self, x0, y0, x1, y1, color):
         dx = x1 - x0
         dy = y1 - y0
@@ -498,11 +2581,31 @@ class RGBMatrix:
             yi = -1
             dy = -dy
 
-        D = (2 * dy) - dx
-        y = y0
-
-        for x in range(x0,x1+1):
-            self.point(x, y, color)
+        clipped = self._clipline(x0,y0,dx,dy,yi,self.rows-1,self.cols-1)
+        if clipped is None:
+            return
+        first,last,y,D = clipped
+
+        if self._runlines or dx >= 16*dy:
+            # Pixels between steps of y form a vertical run
+            start = x0 + first
+            for x in range(x0+first,x0+last+1):
+                if D > 0:
+                    self._vspan(y,start,x,color)
+                    start = x + 1
+                    y = y + yi
+                    D = D + (2 * (dy - dx))
+                else:
+                    D = D + 2*dy
+            if start <= x0+last:
+                self._vspan(y,start,x0+last,color)
+            return
+
+        fb = self._framebuffer
+        dirty = self._dirty
+        for x in range(x0+first,x0+last+1):
+            fb[x][y] = color
+            dirty[x] = _DIRTY_ALL
             if D > 0:
                 y = y + yi
                 D = D + (2 * (dy - dx))
@@ -516,19 +2619,49 @@ class RGBMatrix:
         if dx < 0:
             xi = -1
             dx = -dx
-        D = (2 * dx) - dy
-        x = x0
 
-        for y in range(y0,y1+1):
-            self.point(x, y, color)
+        clipped = self._clipline(y0,x0,dy,dx,xi,self.cols-1,self.rows-1)
+        if clipped is None:
+            return
+        first,last,x,D = clipped
+
+        if self._runlines or dy >= 16*dx:
+            # Pixels between steps of x form a horizontal run
+            start = y0 + first
+            for y in range(y0+first,y0+last+1):
+                if D > 0:
+                    self._span(x,start,y,color)
+                    start = y + 1
+                    x = x + xi
+                    D = D + (2 * (dx - dy))
+                else:
+                    D = D + 2*dx
+            if start <= y0+last:
+                self._span(x,start,y0+last,color)
+            return
+
+        fb = self._framebuffer
+        dirty = self._dirty
+        buf = fb[x]
+        dirty[x] = _DIRTY_ALL
+        end = y0 + last
+        for y in range(y0+first,end+1):
+            buf[y] = color
             if D > 0:
                 x = x + xi
+                if y < end:
+                    buf = fb[x]
+                    dirty[x] = _DIRTY_ALL
                 D = D + (2 * (dx - dy))
             else:
                 D = D + 2*dx
 
     def line(self, x0, y0, x1, y1, color=1):
-        if abs(y1 - y0) < abs(x1 - x0):
+        if x0 == x1:
+            self.hline(x0, min(y0,y1), abs(y1-y0)+1, color)
+        elif y0 == y1:
+            self.vline(min(x0,x1), y0, abs(x1-x0)+1, color)
+        elif abs(y1 - y0) < abs(x1 - x0):
             if x0 > x1:
                 self._plotLineLow(x1, y1, x0, y0, color)
             else:
@@ -546,23 +2679,49 @@ class RGBMatrix:
 
             self.line(points[-1][0],points[-1][1],points[0][0],points[0][1],color)
 
-    def _circleBres(self,centrow,centcol,row,col,color):
-        self.point(centrow+row,centcol+col,color)
-        self.point(centrow-row,centcol+col,color)
-        self.point(centrow+row,centcol-col,color)
-        self.point(centrow-row,centcol-col,color)
-        self.point(centrow+col,centcol+row,color)
-        self.point(centrow-col,centcol+row,color)
-        self.point(centrow+col,centcol-row,color)
-        self.point(centrow-col,centcol-row,color)
+    def lines(self,segments,color=1):
+        # One call for a batch of (row0,col0,row1,col1[,color]) segments
+        line = self.line
+        for segment in segments:
+            if len(segment) > 4:
+                line(*segment)
+            else:
+                line(segment[0],segment[1],segment[2],segment[3],color)
+
+    def _circleBres(self,centrow,centcol,row0,row1,col,color):
+        if row1 - row0 < 8:
+            # Short runs are drawn as points, clipped like the runs drawn with vline and hline
+            rows = self.rows
+            cols = self.cols
+            point = self.point
+            for row in range(row0,row1+1):
+                for prow,pcol in ((centrow+row,centcol+col),(centrow-row,centcol+col),(centrow+row,centcol-col),
+                    (centrow-row,centcol-col),(centrow+col,centcol+row),(centrow-col,centcol+row),
+                    (centrow+col,centcol-row),(centrow-col,centcol-row)):
+                    if 0 <= prow < rows and 0 <= pcol < cols:
+                        point(prow,pcol,color)
+            return
+
+        # Consecutive steps with the same col are drawn as runs in each of the eight octants
+        length = row1 - row0 + 1
+        self.vline(centrow+row0,centcol+col,length,color)
+        self.vline(centrow-row1,centcol+col,length,color)
+        self.vline(centrow+row0,centcol-col,length,color)
+        self.vline(centrow-row1,centcol-col,length,color)
+        self.hline(centrow+col,centcol+row0,length,color)
+        self.hline(centrow-col,centcol+row0,length,color)
+        self.hline(centrow+col,centcol-row1,length,color)
+        self.hline(centrow-col,centcol-row1,length,color)
 
     def circle(self,centrow,centcol,radius,color=1):
         row = 0
         col = radius
         d = 3 - (2 * math.pi)
-        self._circleBres(centrow,centcol,row,col,color)
+        start = row
         while col >= row:
             if d > 0:
+                self._circleBres(centrow,centcol,start,row,col,color)
+                start = row + 1
                 col -= 1
                 d += 4*(row-col) + 10
             else:
@@ -570,8 +2729,70 @@ class RGBMatrix:
 
             row += 1
 
-            self._circleBres(centrow,centcol,row,col,color)
+        self._circleBres(centrow,centcol,start,row,col,color)
+
+    def fill_polygon(self,points,color=1):
+        # Edge table scanline fill of the interior (even-odd rule), the outline is then drawn
+        # with polygon() so the filled shape covers exactly the pixels of its outline
+        edges = []
+        for i in range(len(points)):
+            row0,col0 = points[i-1]
+            row1,col1 = points[i]
+            if row0 != row1:
+                if row0 > row1:
+                    row0,col0,row1,col1 = row1,col1,row0,col0
+                edges.append((row0,col0,row1,col1))
+        if edges:
+            edges.sort()
+            active = []
+            nextedge = 0
+            for row in range(max(edges[0][0],0),min(max(e[2] for e in edges),self.rows)):
+                while nextedge < len(edges) and edges[nextedge][0] <= row:
+                    active.append(edges[nextedge])
+                    nextedge += 1
+                active = [e for e in active if e[2] > row]
+
+                # Crossing columns as exact fractions num/den of each active edge
+                crossings = []
+                for row0,col0,row1,col1 in active:
+                    den = row1 - row0
+                    num = col0*den + (row-row0)*(col1-col0)
+                    crossings.append((num/den,num,den))
+                crossings.sort()
+                for i in range(0,len(crossings)-1,2):
+                    left = -(-crossings[i][1] // crossings[i][2])
+                    right = crossings[i+1][1] // crossings[i+1][2]
+                    if left <= right:
+                        self.hline(row,left,right-left+1,color)
+
+        self.polygon(points,color)
+
+    def fill_circle(self,centrow,centcol,radius,color=1):
+        # Walks the same steps as circle() and records the half width of the span at each row
+        # offset, then draws every row of the disc as a single span
+        widths = [-1] * (radius+2)
+        row = 0
+        col = radius
+        d = 3 - (2 * math.pi)
+        while True:
+            widths[row] = max(widths[row],col)
+            widths[col] = max(widths[col],row)
+            if col < row:
+                break
+            if d > 0:
+                col -= 1
+                d += 4*(row-col) + 10
+            else:
+                d += 4*row + 6
+            row += 1
 
+        for offset in range(radius+2):
+            width = widths[offset]
+            if width < 0:
+                continue
+            self.hline(centrow+offset,centcol-width,2*width+1,color)
+            if offset:
+                self.hline(centrow-offset,centcol-width,2*width+1,color)
 
     def dump(self):
         for i in range(self.rows):
@@ -584,3 +2805,209 @@ class RGBMatrix:
             for j in range(self.cols):
                 print(self.value(i,j),end="")
             print()
+
+class PackedRGBMatrix(RGBMatrix):
+    """
+    An RGBMatrix which keeps its framebuffer packed into a single contiguous bytearray laid out in
+    the order the panel is scanned. Each byte holds the pixel of an upper half row and the pixel
+    directly below it in the lower half, with one bit per color (bit i is the state of rgbPins[i]),
+    which is exactly the data clocked into the panel. This halves the framebuffer memory, avoids a
+    separate heap allocation per row and lets RGBMatrix.refresh() stream the framebuffer itself
+    without building any per row shift data. Pixels are read and written with shifts and masks.
+
+    The parameters are the same as for RGBMatrix except that colordepth must be 1.
+    """
+
+    _streamsof = None           # the packed buffer the streams currently view
+    _runlines = True            # lines are drawn as runs through _span and _vspan
+
+    def __init__(self,rows,cols,addrPins,rgbPins,clockPin,latchPin,OEPin,unused_rgbPins=None,backend=None,
+        colordepth=1,bcmTime=50,numpyBuffer=False,layout=None,dither=None):
+        if colordepth != 1:
+            raise ValueError('PackedRGBMatrix only supports a colordepth of 1')
+        if numpyBuffer or layout:
+            raise ValueError('PackedRGBMatrix does not support a numpyBuffer or a layout')
+        super().__init__(rows,cols,addrPins,rgbPins,clockPin,latchPin,OEPin,unused_rgbPins,backend,
+            colordepth,bcmTime,numpyBuffer,layout,dither)
+
+        self._pinmask = (1 << self._numRGB) - 1
+        self._colorlut = bytearray(256)         # low pin bits of a packed byte to a color value
+        for bits in range(256):
+            color = 0
+            for i in range(self._numRGB):
+                color = (color << 1) | ((bits >> i) & 1)
+            self._colorlut[bits] = color
+
+    def _newbuffer(self):
+        return bytearray((self.rows // 2) * self.cols)
+
+    def _pointstreams(self):
+        # The scan row streams are simply views into the front buffer
+        view = memoryview(self._frontbuffer)
+        cols = self.cols
+        for row in range(self._updaterows):
+            self._streams[row] = view[row*cols:(row+1)*cols]
+        self._streamsof = self._frontbuffer
+
+    def _followfront(self):
+        # A swap changed the front buffer, even if no row changed the streams still view the old
+        # one which is now drawn into
+        if self._streamsof is not self._frontbuffer:
+            self._pointstreams()
+            for row in range(self._updaterows):
+                self._setrepeat(row)
+            self._shifted = -1
+
+    def _updatestreams(self):
+        self._followfront()
+        super()._updatestreams()
+
+    def swap(self,compare=True):
+        super().swap(compare)
+        if self._threaded:
+            # The streams view the old front buffer until the refresh thread picks up the frame,
+            # wait for it so the old front buffer isn't drawn into while it is displayed
+            while self._pending is not None:
+                _yieldthread()
+        else:
+            self._followfront()
+
+    def _buildstream(self,row):
+        if self._streamsof is not self._frontbuffer:
+            self._pointstreams()
+        self._stale[row] &= ~_DIRTY_STREAM
+        self._stale[row + self._updaterows] &= ~_DIRTY_STREAM
+        self._setrepeat(row)
+
+    def _setrepeat(self,row):
+        fb = self._frontbuffer
+        cols = self.cols
+        start = row*cols
+        self._repeat[row] = row > 0 and fb[start-cols:start] == fb[start:start+cols]
+        if row+1 < self._updaterows:
+            self._repeat[row+1] = fb[start:start+cols] == fb[start+cols:start+2*cols]
+
+    def _copyrow(self,dst,src,row):
+        start = (row % self._updaterows) * self.cols
+        dst[start:start+self.cols] = src[start:start+self.cols]
+
+    def _samerow(self,a,b,row):
+        start = (row % self._updaterows) * self.cols
+        return a[start:start+self.cols] == b[start:start+self.cols]
+
+    def value(self,row,col):
+        if row < self._updaterows:
+            return self._colorlut[self._framebuffer[row*self.cols + col] & self._pinmask]
+        return self._colorlut[self._framebuffer[(row-self._updaterows)*self.cols + col] >> self._numRGB]
+
+    def point(self,row,col,color=1):
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            print(f'Bad row,col ({row},{col})')
+            return
+        if row < self._updaterows:
+            index = row*self.cols + col
+            shift = 0
+        else:
+            index = (row-self._updaterows)*self.cols + col
+            shift = self._numRGB
+        fb = self._framebuffer
+        fb[index] = (fb[index] & ~(self._pinmask << shift)) | (self._planeluts[0][color] << shift)
+        self._dirty[row] = _DIRTY_ALL
+
+    def fill(self,color,replace=None,swap=False,bounds=None):
+        if bounds is not None:
+            # Rectangles cut across the packed scan rows, recolor them one pixel at a time
+            for row in range(max(bounds[0],0),min(bounds[2],self.rows-1)+1):
+                for col in range(max(bounds[1],0),min(bounds[3],self.cols-1)+1):
+                    pixel = self.value(row,col)
+                    if replace is None or pixel == replace:
+                        self.point(row,col,color)
+                    elif swap and pixel == color:
+                        self.point(row,col,replace)
+            return
+
+        numRGB = self._numRGB
+        lut = self._planeluts[0]
+        fb = self._framebuffer
+        if replace is None:
+            bits = lut[color]
+            fb[:] = bytes([bits | (bits << numRGB)]) * len(fb)
+        else:
+            # Both pixels of every packed byte are recolored through one 256 entry table
+            table = bytearray(256)
+            for packed in range(256):
+                result = 0
+                for shift in (0,numRGB):
+                    pixel = self._colorlut[(packed >> shift) & self._pinmask]
+                    if pixel == replace:
+                        pixel = color
+                    elif swap and pixel == color:
+                        pixel = replace
+                    result |= lut[pixel] << shift
+                table[packed] = result
+            try:
+                fb[:] = fb.translate(table)
+            except AttributeError:
+                for i in range(len(fb)):
+                    fb[i] = table[fb[i]]
+
+        for i in range(self.rows):
+            self._dirty[i] = _DIRTY_ALL
+        if color == 0 and replace is None and not self._running:
+            self.sendrow(0)
+
+    def _span(self,row,col0,col1,color):
+        if row < self._updaterows:
+            start = row*self.cols
+            shift = 0
+        else:
+            start = (row-self._updaterows)*self.cols
+            shift = self._numRGB
+        keep = ~(self._pinmask << shift) & 0xff
+        bits = self._planeluts[0][color] << shift
+        fb = self._framebuffer
+        for index in range(start+col0,start+col1+1):
+            fb[index] = (fb[index] & keep) | bits
+        self._dirty[row] = _DIRTY_ALL
+
+    def _vspan(self,col,row0,row1,color):
+        for row in range(row0,row1+1):
+            self._span(row,col,col,color)
+
+    def scroll(self,drows,dcols,fill=0,wrap=False):
+        # Rows of the upper and lower half share bytes, so the rows are unpacked, moved and only
+        # the rows which changed are packed again
+        rows = self.rows
+        cols = self.cols
+        old = [bytes(self.value(row,col) for col in range(cols)) for row in range(rows)]
+        blank = bytes((fill,)) * cols
+        for row in range(rows):
+            src = row - drows
+            if wrap:
+                line = old[src % rows]
+                shift = dcols % cols
+                line = line[cols-shift:] + line[:cols-shift]
+            elif 0 <= src < rows and abs(dcols) < cols:
+                line = old[src]
+                if dcols > 0:
+                    line = blank[:dcols] + line[:cols-dcols]
+                elif dcols < 0:
+                    line = line[-dcols:] + blank[:-dcols]
+            else:
+                line = blank
+            if line != old[row]:
+                self._blitspan(row,0,line)
+
+    def _blitspan(self,row,col,pixels):
+        if row < self._updaterows:
+            start = row*self.cols + col
+            shift = 0
+        else:
+            start = (row-self._updaterows)*self.cols + col
+            shift = self._numRGB
+        keep = ~(self._pinmask << shift) & 0xff
+        lut = self._planeluts[0]
+        fb = self._framebuffer
+        for index in range(len(pixels)):
+            fb[start+index] = (fb[start+index] & keep) | (lut[pixels[index]] << shift)
+        self._dirty[row] = _DIRTY_ALL
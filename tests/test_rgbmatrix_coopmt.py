@@ -0,0 +1,1030 @@
+"""
+Behaviour tests for rgbmatrix_coopmt
+====================================================
+
+Runs the driver against the SimulatedPanel backend, so no GPIO hardware is needed. Run from the
+repository root with CPython:
+
+    python -m unittest discover tests        (or python -m pytest tests)
+"""
+
+import asyncio
+import contextlib
+import io
+import math
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import unittest
+from array import array
+from fractions import Fraction
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import rgbmatrix_coopmt
+from rgbmatrix_coopmt import RGBMatrix,PackedRGBMatrix,SimulatedPanel
+
+RGBPINS = ["R1","G1","B1","R2","G2","B2"]
+
+def make(rows=16,cols=32,cls=RGBMatrix,**kwargs):
+    layout = kwargs.get('layout')
+    panelRows = rows if layout is None else layout.panelRows
+    panel = kwargs.pop('backend',None) or SimulatedPanel(panelRows,cols if layout is None else layout.chainCols)
+    addrPins = ["A","B","C","D","E"][:len(bin(panelRows))-4]
+    return cls(rows,cols,addrPins,RGBPINS,"CLK","LAT","OE",backend=panel,**kwargs),panel
+
+def pixels(matrix):
+    return [[int(matrix.value(row,col)) for col in range(matrix.cols)] for row in range(matrix.rows)]
+
+def random_image(matrix,seed=1,colors=8):
+    rand = random.Random(seed)
+    for row in range(matrix.rows):
+        for col in range(matrix.cols):
+            matrix.point(row,col,rand.randrange(colors))
+
+def reference_line(row0,col0,row1,col1):
+    # The unclipped Bresenham line of the original driver, as a list of (row,col) points
+    points = []
+    if abs(col1 - col0) < abs(row1 - row0):
+        if row0 > row1:
+            row0,col0,row1,col1 = row1,col1,row0,col0
+        dmajor,dminor,step = row1 - row0,abs(col1 - col0),1 if col1 >= col0 else -1
+        minor = col0
+        D = 2*dminor - dmajor
+        for major in range(row0,row1+1):
+            points.append((major,minor))
+            if D > 0:
+                minor += step
+                D += 2*(dminor - dmajor)
+            else:
+                D += 2*dminor
+    else:
+        if col0 > col1:
+            row0,col0,row1,col1 = row1,col1,row0,col0
+        dmajor,dminor,step = col1 - col0,abs(row1 - row0),1 if row1 >= row0 else -1
+        minor = row0
+        D = 2*dminor - dmajor
+        for major in range(col0,col1+1):
+            points.append((minor,major))
+            if D > 0:
+                minor += step
+                D += 2*(dminor - dmajor)
+            else:
+                D += 2*dminor
+    return points
+
+def reference_circle(centrow,centcol,radius):
+    # The unclipped midpoint circle of the original driver, as a set of (row,col) points
+    points = set()
+    row = 0
+    col = radius
+    d = 3 - (2 * math.pi)
+    while True:
+        for r,c in ((row,col),(col,row)):
+            points.update(((centrow+r,centcol+c),(centrow-r,centcol+c),(centrow+r,centcol-c),(centrow-r,centcol-c)))
+        if col < row:
+            return points
+        if d > 0:
+            col -= 1
+            d += 4*(row-col) + 10
+        else:
+            d += 4*row + 6
+        row += 1
+
+class FakePin:
+    # Stands in for a digitalio.DigitalInOut (value attribute) and a machine.Pin (value() method),
+    # a clock pin records the data pin levels on each rising edge
+    def __init__(self,data=None):
+        self.level = 0
+        self.data = data
+        self.clocked = []
+
+    def _set(self,level):
+        level = 1 if level else 0
+        if self.data is not None and level and not self.level:
+            self.clocked.append(sum(pin.level << i for i,pin in enumerate(self.data)))
+        self.level = level
+
+    value = property(lambda self: self.level,_set)
+
+class MicroPin(FakePin):
+    def value(self,level):
+        self._set(level)
+
+class LitPanel(SimulatedPanel):
+    # Counts the clocks shifted in while each row is lit, which is how long it is displayed
+
+    def reset_counters(self):
+        super().reset_counters()
+        self.litclocks = [0] * (self.rows // 2)
+
+    def _write(self,pin,value):
+        if value and pin == self._clk and not self._state[pin] and not self._state[self._oe]:
+            self.litclocks[self._row] += 1
+        super()._write(pin,value)
+
+class PlanePanel(SimulatedPanel):
+    # Records the LEDs of the addressed rows each time the display is turned on
+
+    def reset_counters(self):
+        super().reset_counters()
+        self.shown = [[] for i in range(self.rows // 2)]
+
+    def enable(self,on):
+        super().enable(on)
+        if on:
+            self.shown[self._row].append((bytes(self.leds[self._row]),bytes(self.leds[self._row + self.rows // 2])))
+
+class PinsTest(unittest.TestCase):
+
+    def test_shift(self):
+        stream = bytes(range(64))
+        for backend,pin in ((rgbmatrix_coopmt.CircuitPythonPins,FakePin),(rgbmatrix_coopmt.MicroPythonPins,MicroPin)):
+            for count in (2,3,4,6):
+                pins = backend()
+                pins._rgbIO = [pin() for i in range(count)]
+                pins._clockIO = pin(pins._rgbIO)
+                pins.shift(stream)
+                self.assertEqual(pins._clockIO.clocked,[bits & ((1 << count) - 1) for bits in stream])
+                self.assertEqual(pins._clockIO.level,0)
+
+    def test_port_pins(self):
+        rgbBits = [2,3,4,17,27,22]
+        for usePort in (True,False):
+            panel = SimulatedPanel(16,32)
+            port = rgbmatrix_coopmt.SimulatedPort(panel) if usePort else None
+            pins = rgbmatrix_coopmt.PortPins(panel,port,rgbBits,11)
+            matrix = RGBMatrix(16,32,["A","B","C"],RGBPINS,"CLK","LAT","OE",backend=pins)
+            random_image(matrix)
+            panel.reset_counters()
+            if usePort:
+                port.writes = 0
+            matrix.refresh(False)
+            self.assertEqual([list(row) for row in panel.leds],pixels(matrix))
+            self.assertEqual(panel.clocks,8 * 32)
+            if usePort:
+                # The clear, set and clock writes of a clock, the set write is left out with no bits set
+                self.assertTrue(2 * panel.clocks <= port.writes <= 3 * panel.clocks)
+        self.assertRaises(ValueError,rgbmatrix_coopmt.PortPins(SimulatedPanel(16,32),None,rgbBits[:4],11).setup,
+            ["A","B","C"],RGBPINS,"CLK","LAT","OE")
+
+class RefreshTest(unittest.TestCase):
+
+    def assertShown(self,matrix,panel):
+        self.assertEqual([list(row) for row in panel.leds],pixels(matrix))
+
+    def test_leds_match_framebuffer(self):
+        modes = [(RGBMatrix,{}),(PackedRGBMatrix,{})]
+        if rgbmatrix_coopmt.numpy is not None:
+            modes.append((RGBMatrix,{'numpyBuffer':True}))
+        for cls,kwargs in modes:
+            for optimize in (True,False):
+                matrix,panel = make(cls=cls,**kwargs)
+                random_image(matrix)
+                matrix.hline(3,0,32,5)
+                matrix.hline(4,0,32,5)      # a repeated row
+                matrix.refresh(optimize)
+                self.assertShown(matrix,panel)
+
+    def test_layout(self):
+        layout = rgbmatrix_coopmt.PanelLayout(16,32,2,2,serpentine=True)
+        matrix,panel = make(layout.rows,layout.cols,layout=layout)
+        random_image(matrix)
+        matrix.refresh()
+        for row in range(layout.panelRows):
+            for col in range(layout.chainCols):
+                canvasRow,canvasCol = layout.canvas(row,col)
+                self.assertEqual(panel.leds[row][col],matrix.value(canvasRow,canvasCol))
+
+    def test_layout_matches_reference(self):
+        configs = [
+            ((16,32,2,2),{'serpentine':True},{}),
+            ((16,32,3),{'rotation':180},{}),
+            ((16,32,1,2),{'rotation':90},{}),
+            ((16,16,2,2),{'rotations':[0,90,180,270]},{}),
+            ((16,16,2,2),{'serpentine':True,'rotation':270},{'numpyBuffer':True}),
+        ]
+        for args,layoutargs,kwargs in configs:
+            if kwargs and rgbmatrix_coopmt.numpy is None:
+                continue
+            layout = rgbmatrix_coopmt.PanelLayout(*args,**layoutargs)
+            panelRows,panelCols,across = args[:3]
+            down = args[3] if len(args) > 3 else 1
+            rotations = layoutargs.get('rotations',[layoutargs.get('rotation',0)] * (across*down))
+            matrix,panel = make(layout.rows,layout.cols,layout=layout,**kwargs)
+            random_image(matrix)
+            matrix.refresh()
+
+            # Each tile shows its panel's image rotated clockwise, so a panel shows its tile of the
+            # canvas rotated back
+            image = pixels(matrix)
+            chain = [[] for row in range(panelRows)]
+            for index in range(across*down):
+                tilerow,tilecol = divmod(index,across)
+                rot = rotations[index]
+                if layoutargs.get('serpentine') and tilerow % 2:
+                    tilecol = across - 1 - tilecol
+                    rot += 180
+                tileRows,tileCols = (panelRows,panelCols) if rotations[0] % 180 == 0 else (panelCols,panelRows)
+                tile = [line[tilecol*tileCols:(tilecol+1)*tileCols] for line in image[tilerow*tileRows:(tilerow+1)*tileRows]]
+                for turn in range((360 - rot % 360) // 90 % 4):
+                    tile = [list(line) for line in zip(*tile[::-1])]
+                for row in range(panelRows):
+                    chain[row] += tile[row]
+            self.assertEqual([list(row) for row in panel.leds],chain,(args,layoutargs))
+
+    def test_refresh_step_covers_frame(self):
+        matrix,panel = make()
+        random_image(matrix)
+        for i in range(matrix._updaterows):
+            matrix.refresh_step(0)
+        self.assertShown(matrix,panel)
+
+    def test_double_buffering(self):
+        for cls in (RGBMatrix,PackedRGBMatrix):
+            matrix,panel = make(cls=cls)
+            random_image(matrix)
+            first = pixels(matrix)
+            matrix.refresh()
+            matrix.begin_frame()
+            self.assertEqual(pixels(matrix),first)      # the back buffer starts as the displayed frame
+            matrix.fill_rect(2,3,4,5,6)
+            second = pixels(matrix)
+            matrix.refresh()
+            self.assertEqual([list(row) for row in panel.leds],first)
+            matrix.swap()
+            matrix.refresh()
+            self.assertEqual([list(row) for row in panel.leds],second)
+
+            # Without copying the back buffer still holds the frame before the last swap
+            matrix.begin_frame(copy=False)
+            self.assertEqual(pixels(matrix),first)
+            matrix.begin_frame()
+            self.assertEqual(pixels(matrix),second)
+
+        # Rows a swap leaves unchanged are not rebuilt
+        matrix,panel = make()
+        random_image(matrix)
+        matrix.begin_frame()
+        matrix.swap()
+        matrix.refresh()
+        matrix.begin_frame()
+        matrix.blit([bytearray(matrix.framebuffer[3])],3,0)     # redrawn unchanged
+        matrix.point(12,5,(matrix.value(12,5) + 1) % 8)
+        rebuilt = []
+        buildstream = matrix._buildstream
+        matrix._buildstream = lambda row: (rebuilt.append(row),buildstream(row))
+        matrix.swap()
+        matrix.refresh()
+        self.assertEqual(rebuilt,[4])
+        # Without comparing every row drawn into is rebuilt
+        matrix.begin_frame()
+        matrix.blit([bytearray(matrix.framebuffer[3])],3,0)
+        matrix.swap(compare=False)
+        matrix.refresh()
+        self.assertEqual(rebuilt,[4,3])
+        self.assertShown(matrix,panel)
+
+    def test_packed_swap_without_changes(self):
+        # An unchanged swap must still leave the back buffer off the panel
+        for cls in (RGBMatrix,PackedRGBMatrix):
+            matrix,panel = make(cls=cls)
+            matrix.begin_frame()
+            matrix.swap()
+            matrix.refresh(False)
+            matrix.begin_frame()
+            matrix.fill_rect(2,2,10,10,3)
+            matrix.refresh(False)
+            self.assertTrue(all(value == 0 for row in panel.leds for value in row),cls.__name__)
+            matrix.swap()
+            matrix.refresh(False)
+            self.assertEqual(panel.leds[5][5],3)
+
+    @unittest.skipIf(rgbmatrix_coopmt._thread is None,'no _thread module')
+    def test_background_refresh(self):
+        for cls in (RGBMatrix,PackedRGBMatrix):
+            matrix,panel = make(cls=cls)
+            matrix.begin_frame()
+            matrix.start_background_refresh()
+            try:
+                for frame in range(4):
+                    matrix.begin_frame()
+                    random_image(matrix,seed=frame)
+                    matrix.swap()
+                    # The frame has been displayed once the thread has finished with it
+                    while matrix._pending is not None:
+                        time.sleep(0.001)
+                    if cls is RGBMatrix:
+                        self.assertEqual([list(row) for row in panel.leds],[list(row) for row in matrix._frontbuffer])
+                    matrix.begin_frame()
+                    self.assertShown(matrix,panel)
+            finally:
+                matrix.stop()
+            self.assertFalse(matrix._threaded)
+
+    def test_packed_rejects_unsupported_modes(self):
+        layout = rgbmatrix_coopmt.PanelLayout(16,32,2)
+        for args in ((3,),(1,50,True),(1,50,False,layout)):
+            panel = SimulatedPanel(16,32)
+            with self.assertRaises(ValueError):
+                PackedRGBMatrix(16,32,["A","B","C"],RGBPINS,"CLK","LAT","OE",None,panel,*args)
+        for kwargs in ({'colordepth':2},{'numpyBuffer':True},{'layout':layout}):
+            self.assertRaises(ValueError,make,cls=PackedRGBMatrix,**kwargs)
+
+    def test_run_turns_display_off_between_slices(self):
+        matrix,panel = make()
+        random_image(matrix)
+        states = []
+
+        async def other():
+            for i in range(20):
+                states.append(panel._state[panel._oe])     # 1 while the output is disabled
+                await asyncio.sleep(0)
+            matrix.stop()
+
+        async def main():
+            await asyncio.gather(matrix.run(rows=4),other())
+
+        asyncio.run(main())
+        self.assertTrue(all(states[1:]))
+        self.assertShown(matrix,panel)
+
+    def test_bcm_planes(self):
+        modes = [(RGBPINS,3,{}),(RGBPINS,5,{}),(["R1","G1","R2","G2"],8,{})]
+        if rgbmatrix_coopmt.numpy is not None:
+            modes += [(RGBPINS,5,{'numpyBuffer':True}),(RGBPINS,2,{'numpyBuffer':True})]
+        for rgbPins,colordepth,kwargs in modes:
+            numRGB = len(rgbPins) // 2
+            panel = PlanePanel(16,32)
+            matrix = RGBMatrix(16,32,["A","B","C"],rgbPins,"CLK","LAT","OE",backend=panel,colordepth=colordepth,
+                bcmTime=1,**kwargs)
+            random_image(matrix,colors=1 << (numRGB * colordepth))
+            self.assertTrue(all(len(lut) == 256 for lut in matrix._planeluts + (matrix._planehighluts or [])))
+            panel.reset_counters()
+            matrix.refresh()
+            # Plane k of every row is displayed once, in order, and holds bit k of each channel
+            for row in range(8):
+                self.assertEqual(len(panel.shown[row]),colordepth)
+                for half in (0,1):
+                    for col in range(32):
+                        value = 0
+                        for i in range(numRGB):
+                            channel = 0
+                            for plane in range(colordepth):
+                                channel |= ((panel.shown[row][plane][half][col] >> (numRGB-1-i)) & 1) << plane
+                            value = (value << colordepth) | channel
+                        self.assertEqual(value,matrix.value(row + 8*half,col))
+
+    def test_brightness(self):
+        for optimize in (True,False):
+            panel = LitPanel(16,32)
+            matrix,unused = make(backend=panel)
+            random_image(matrix)
+            matrix.hline(3,0,32,5)
+            matrix.hline(4,0,32,5)      # a repeated row still gets its on period
+            matrix.brightness = 0.25
+            panel.reset_counters()
+            for i in range(3):
+                matrix.refresh(optimize)
+                self.assertEqual(panel._state[panel._oe],1)     # off between calls
+                self.assertShown(matrix,panel)
+            # Each row is lit while the first quarter of the next row is shifted in, the last row
+            # while the first row of the next call is shifted in
+            self.assertEqual(panel.litclocks,[24] * 8)
+
+        matrix.brightness = 0
+        panel.leds = [bytearray(32) for i in range(16)]
+        panel.reset_counters()
+        matrix.refresh()
+        self.assertEqual(panel.litclocks,[0] * 8)
+        self.assertTrue(all(value == 0 for row in panel.leds for value in row))
+        matrix.brightness = 2
+        self.assertEqual(matrix.brightness,1)
+
+    def test_stats_frames(self):
+        for colordepth in (1,3):
+            matrix,panel = make(colordepth=colordepth)
+            frames = []
+            matrix.enable_stats(lambda stats: frames.append(stats['frames']))
+            matrix.refresh()
+            self.assertEqual(matrix.stats()['frames'],1)
+            matrix.refresh()
+            self.assertEqual(frames,[1,2])
+
+    def test_dither_duty_cycle(self):
+        for dither in ('ordered','diffusion'):
+            matrix,panel = make(colordepth=2,dither=dither)
+            random_image(matrix,colors=64)
+            counts = [[[0,0,0] for col in range(matrix.cols)] for row in range(matrix.rows)]
+            for frame in range(3):
+                matrix.refresh()
+                for row in range(matrix.rows):
+                    for col in range(matrix.cols):
+                        for channel in range(3):
+                            counts[row][col][channel] += (panel.leds[row][col] >> (2-channel)) & 1
+            for row in range(matrix.rows):
+                for col in range(matrix.cols):
+                    value = matrix.value(row,col)
+                    self.assertEqual(counts[row][col],[(value >> shift) & 3 for shift in (4,2,0)])
+
+    def test_dither_refresh_step_order(self):
+        matrix,panel = make(colordepth=2,dither='ordered')
+        subframes = []
+        for i in range(matrix._updaterows * 6):
+            matrix.refresh_step(0)
+            if matrix._nextrow == 0:
+                subframes.append(matrix._subframe)
+        for previous,current in zip(subframes,subframes[1:]):
+            self.assertEqual(current,(previous + 1) % 3)
+
+class DrawingTest(unittest.TestCase):
+
+    def test_dirty_rows(self):
+        bitmap = [bytearray([1,0,2,3]),bytearray([4,4,0,5])]
+        drawing = [
+            lambda m: m.point(3,4,6),
+            lambda m: m.hline(5,-3,10,2),
+            lambda m: m.vline(2,30,9,3),
+            lambda m: m.rect(1,1,6,8,4),
+            lambda m: m.fill_rect(9,4,3,20,5),
+            lambda m: m.line(0,31,15,0,6),
+            lambda m: m.lines([(1,1,1,20),(2,2,12,2,3)],7),
+            lambda m: m.circle(8,16,6,2),
+            lambda m: m.fill_circle(8,16,4,1),
+            lambda m: m.fill_polygon([(2,2),(13,8),(4,28)],3),
+            lambda m: m.fillarea(0,0,6),
+            lambda m: m.fill(1,replace=2,swap=True),
+            lambda m: m.fill(4,bounds=(3,3,6,6)),
+            lambda m: m.blit(bitmap,6,10,transparent=0),
+            lambda m: m.text(9,1,'Hi!',7),
+            lambda m: m.scroll(2,-3,fill=0),
+        ]
+        modes = [(RGBMatrix,{}),(PackedRGBMatrix,{})]
+        if rgbmatrix_coopmt.numpy is not None:
+            modes.append((RGBMatrix,{'numpyBuffer':True}))
+        for cls,kwargs in modes:
+            for draw in drawing:
+                matrix,panel = make(cls=cls,**kwargs)
+                random_image(matrix,colors=3)
+                self.assertEqual(matrix.dirty_rows(),list(range(16)))
+                matrix.refresh()
+                matrix.clear_dirty()
+                self.assertEqual(matrix.dirty_rows(),[])
+                before = pixels(matrix)
+                draw(matrix)
+                after = pixels(matrix)
+                changed = [row for row in range(16) if before[row] != after[row]]
+                self.assertTrue(changed)
+                self.assertTrue(set(changed) <= set(matrix.dirty_rows()))
+                # Clearing the reported rows doesn't stop the refresh from rebuilding them
+                matrix.clear_dirty()
+                matrix.refresh()
+                self.assertEqual([list(row) for row in panel.leds],after)
+
+    def test_line_endpoints_and_fill(self):
+        for cls in (RGBMatrix,PackedRGBMatrix):
+            matrix,panel = make(cls=cls)
+            matrix.line(0,0,15,31,3)
+            self.assertEqual(matrix.value(0,0),3)
+            self.assertEqual(matrix.value(15,31),3)
+            self.assertEqual(sum(value == 3 for row in pixels(matrix) for value in row),32)
+            matrix.fill(3,replace=0,swap=True)
+            self.assertEqual(sum(value == 0 for row in pixels(matrix) for value in row),32)
+
+    def test_fill_matches_reference(self):
+        rand = random.Random(5)
+        modes = [(RGBMatrix,{}),(PackedRGBMatrix,{}),(RGBMatrix,{'colordepth':3})]
+        if rgbmatrix_coopmt.numpy is not None:
+            modes += [(RGBMatrix,{'numpyBuffer':True}),(RGBMatrix,{'numpyBuffer':True,'colordepth':3})]
+        for cls,kwargs in modes:
+            colors = 1 << (3 * kwargs.get('colordepth',1))
+            for trial in range(10):
+                matrix,panel = make(cls=cls,**kwargs)
+                random_image(matrix,seed=trial,colors=4)
+                matrix.refresh()
+                matrix.clear_dirty()
+                color = rand.randrange(colors)
+                replace = rand.choice((None,rand.randrange(4)))
+                swap = rand.random() < 0.5
+                bounds = rand.choice((None,(rand.randrange(-2,16),rand.randrange(-2,32),rand.randrange(18),rand.randrange(34))))
+                row1,col1,row2,col2 = bounds or (0,0,15,31)
+                expected = pixels(matrix)
+                for row in range(max(row1,0),min(row2,15)+1):
+                    for col in range(max(col1,0),min(col2,31)+1):
+                        value = expected[row][col]
+                        if replace is None or value == replace:
+                            expected[row][col] = color
+                        elif swap and value == color:
+                            expected[row][col] = replace
+                changed = [row for row in range(16) if expected[row] != pixels(matrix)[row]]
+                matrix.fill(color,replace,swap,bounds)
+                self.assertEqual(pixels(matrix),expected)
+                self.assertTrue(set(changed) <= set(matrix.dirty_rows()))
+                if colors == 8:
+                    matrix.refresh()
+                    self.assertEqual([list(row) for row in panel.leds],expected)
+
+    @unittest.skipIf(rgbmatrix_coopmt.numpy is None,'numpy is not installed')
+    def test_numpy_framebuffer(self):
+        matrix,panel = make(numpyBuffer=True)
+        matrix.refresh()
+        matrix.framebuffer[2:5,3:9] = 4
+        matrix.mark_dirty(range(2,5))
+        self.assertEqual(matrix.dirty_rows(),[2,3,4])
+        matrix.refresh(False)
+        self.assertEqual(panel.leds[3][5],4)
+        self.assertEqual([list(row) for row in panel.leds],pixels(matrix))
+        matrix.framebuffer[:] = 1
+        matrix.mark_dirty()
+        matrix.refresh()
+        self.assertTrue(all(value == 1 for row in panel.leds for value in row))
+
+    def test_line_matches_reference(self):
+        rand = random.Random(7)
+        for cls in (RGBMatrix,PackedRGBMatrix):
+            for trial in range(200):
+                ends = [rand.randrange(-40,56),rand.randrange(-40,72),rand.randrange(-40,56),rand.randrange(-40,72)]
+                if trial < 20:
+                    ends[2] = ends[0]   # horizontal and vertical lines
+                elif trial < 40:
+                    ends[3] = ends[1]
+                matrix,panel = make(cls=cls)
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    matrix.line(*ends,color=5)
+                self.assertEqual(output.getvalue(),'')
+                expected = [[0] * 32 for row in range(16)]
+                for row,col in reference_line(*ends):
+                    if 0 <= row < 16 and 0 <= col < 32:
+                        expected[row][col] = 5
+                self.assertEqual(pixels(matrix),expected,ends)
+
+            matrix,panel = make(cls=cls)
+            matrix.lines([(0,0,15,31),(15,0,0,31,3),(-5,10,20,12,6)],2)
+            expected,panel = make()
+            expected.line(0,0,15,31,2)
+            expected.line(15,0,0,31,3)
+            expected.line(-5,10,20,12,6)
+            self.assertEqual(pixels(matrix),pixels(expected))
+
+    def test_fill_polygon_matches_reference(self):
+        rand = random.Random(6)
+        for trial in range(40):
+            points = [(rand.randrange(-4,20),rand.randrange(-4,36)) for i in range(rand.randrange(3,8))]
+            matrix,panel = make(cls=rand.choice((RGBMatrix,PackedRGBMatrix)))
+            matrix.fill_polygon(points,3)
+            # The outline of polygon() plus every pixel whose even-odd scanline crossings put it
+            # inside, edges include their top row and exclude their bottom row
+            expected,panel = make()
+            expected.polygon(points,3)
+            for row in range(16):
+                crossings = []
+                for (row0,col0),(row1,col1) in zip(points,points[1:] + points[:1]):
+                    if min(row0,row1) <= row < max(row0,row1):
+                        crossings.append(Fraction(col0) + Fraction((row-row0)*(col1-col0),row1-row0))
+                for col in range(32):
+                    if sum(x < col for x in crossings) % 2 or col in crossings:
+                        expected.point(row,col,3)
+            self.assertEqual(pixels(matrix),pixels(expected),points)
+
+    def test_fill_circle_covers_circle(self):
+        for radius in range(9):
+            for centrow,centcol in ((8,16),(1,30),(14,2)):
+                matrix,panel = make()
+                matrix.fill_circle(centrow,centcol,radius,5)
+                # Every row of the unclipped circle is filled between its outermost pixels
+                circle,panel = make(64,64)
+                circle.circle(centrow+16,centcol+16,radius,1)
+                for row in range(16):
+                    cols = [col - 16 for col in range(64) if circle.value(row+16,col)]
+                    for col in range(32):
+                        self.assertEqual(matrix.value(row,col),5 if cols and min(cols) <= col <= max(cols) else 0)
+
+    def test_fillarea_matches_reference(self):
+        rand = random.Random(3)
+        for trial in range(20):
+            matrix,panel = make(cls=rand.choice((RGBMatrix,PackedRGBMatrix)))
+            for row in range(matrix.rows):
+                for col in range(matrix.cols):
+                    if rand.random() < 0.4:
+                        matrix.point(row,col,1)
+            row = rand.randrange(matrix.rows)
+            col = rand.randrange(matrix.cols)
+            expected = pixels(matrix)
+            blank = expected[row][col]
+            todo = [(row,col)]
+            while todo:
+                r,c = todo.pop()
+                if 0 <= r < matrix.rows and 0 <= c < matrix.cols and expected[r][c] == blank:
+                    expected[r][c] = 2
+                    todo.extend(((r+1,c),(r-1,c),(r,c+1),(r,c-1)))
+            if blank == 2:
+                expected = pixels(matrix)
+            matrix.fillarea(row,col,2)
+            self.assertEqual(pixels(matrix),expected)
+
+    def test_spans_match_reference(self):
+        rand = random.Random(8)
+        for cls in (RGBMatrix,PackedRGBMatrix):
+            for trial in range(100):
+                row,col = rand.randrange(-8,20),rand.randrange(-8,36)
+                height,width = rand.randrange(-2,20),rand.randrange(-2,40)
+                cells = {
+                    'hline': {(row,c) for c in range(col,col+width)},
+                    'vline': {(r,col) for r in range(row,row+height)},
+                    'fill_rect': {(r,c) for r in range(row,row+height) for c in range(col,col+width)},
+                }
+                cells['rect'] = {(r,c) for r,c in cells['fill_rect'] if r in (row,row+height-1) or c in (col,col+width-1)}
+                for name,args in (('hline',(row,col,width)),('vline',(row,col,height)),
+                    ('rect',(row,col,height,width)),('fill_rect',(row,col,height,width))):
+                    matrix,panel = make(cls=cls)
+                    output = io.StringIO()
+                    with contextlib.redirect_stdout(output):
+                        getattr(matrix,name)(*args,color=6)
+                    self.assertEqual(output.getvalue(),'')
+                    expected = [[6 if (r,c) in cells[name] else 0 for c in range(32)] for r in range(16)]
+                    self.assertEqual(pixels(matrix),expected,(name,args))
+
+    def test_circle_matches_reference(self):
+        for cls in (RGBMatrix,PackedRGBMatrix):
+            for radius in range(12):
+                for centrow,centcol in ((8,16),(0,0),(15,31),(-3,20),(7,40)):
+                    matrix,panel = make(cls=cls)
+                    matrix.circle(centrow,centcol,radius,4)
+                    points = reference_circle(centrow,centcol,radius)
+                    expected = [[4 if (row,col) in points else 0 for col in range(32)] for row in range(16)]
+                    self.assertEqual(pixels(matrix),expected,(centrow,centcol,radius))
+
+    def test_fillarea_stack_is_bounded(self):
+        # A grid of dots leaves a blank pixel above and below every span, the pending ranges must
+        # still be compacted instead of growing with the number of spans (1954 ranges before)
+        for cls in (RGBMatrix,PackedRGBMatrix):
+            matrix,panel = make(64,64,cls=cls)
+            for row in range(1,64,2):
+                for col in range(row % 4 // 2,64,2):
+                    matrix.point(row,col,1)
+            spans = matrix.fillarea_spans(0,0,2)
+            peak = 0
+            rows = []
+            for row in spans:
+                rows.append(row)
+                peak = max(peak,len(spans.gi_frame.f_locals['stack']))
+            self.assertTrue(peak < 2 * 64,peak)
+            self.assertTrue(all(value for line in pixels(matrix) for value in line))
+            self.assertEqual(sorted(set(rows)),list(range(64)))
+
+    def test_circle_is_clipped(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            matrix,panel = make(32,64)
+            matrix.circle(1,1,5)
+            other,panel = make(32,64)
+            other.fill_circle(1,1,5,2)
+        self.assertEqual(output.getvalue(),'')
+        for row in range(32):
+            for col in range(64):
+                if matrix.value(row,col):
+                    self.assertTrue(row < 8 and col < 8)
+                    self.assertEqual(other.value(row,col),2)
+
+    def test_blit_matches_reference(self):
+        rand = random.Random(9)
+        modes = [(RGBMatrix,{}),(PackedRGBMatrix,{})]
+        if rgbmatrix_coopmt.numpy is not None:
+            modes.append((RGBMatrix,{'numpyBuffer':True}))
+        for trial in range(60):
+            bits = rand.choice((1,3,8))
+            height,width = rand.randrange(1,12),rand.randrange(1,40)
+            image = [[rand.randrange(min(1 << bits,8)) for col in range(width)] for row in range(height)]
+            # Pack the rows most significant bits first, each row padded to whole bytes
+            data = bytearray()
+            for line in image:
+                packed = 0
+                for value in line:
+                    packed = (packed << bits) | value
+                stride = (width*bits + 7) // 8
+                data += (packed << (stride*8 - width*bits)).to_bytes(stride,'big')
+            bitmap = rgbmatrix_coopmt.Bitmap(height,width,bits,data)
+            self.assertEqual([[bitmap.value(row,col) for col in range(width)] for row in range(height)],image)
+            source = rand.choice((bitmap,[bytearray(line) for line in image],[list(line) for line in image]))
+
+            row,col = rand.randrange(-12,16),rand.randrange(-40,32)
+            transparent = rand.choice((None,0,1))
+            remap = rand.choice((None,bytes([(7 - value) % 8 for value in range(256)])))
+            for cls,kwargs in modes:
+                matrix,panel = make(cls=cls,**kwargs)
+                random_image(matrix,seed=trial)
+                expected = pixels(matrix)
+                for r in range(height):
+                    for c in range(width):
+                        value = image[r][c]
+                        if value != transparent and 0 <= row+r < 16 and 0 <= col+c < 32:
+                            expected[row+r][col+c] = value if remap is None else remap[value]
+                matrix.blit(source,row,col,transparent,remap)
+                self.assertEqual(pixels(matrix),expected)
+
+        bitmap = rgbmatrix_coopmt.Bitmap(3,5,3)
+        bitmap.point(1,2,6)
+        bitmap.point(2,4,5)
+        self.assertEqual([[bitmap.value(row,col) for col in range(5)] for row in range(3)],[[0] * 5,[0,0,6,0,0],[0,0,0,0,5]])
+
+    def test_blit_wide_rows(self):
+        matrix,panel = make(colordepth=3)
+        matrix.blit([array('H',[448,56,7]),[5,0,6]],2,3,transparent=0)
+        self.assertEqual([matrix.value(2,col) for col in range(2,8)],[0,448,56,7,0,0])
+        self.assertEqual([matrix.value(3,col) for col in range(2,8)],[0,5,0,6,0,0])
+
+    def test_text_matches_reference(self):
+        tall = rgbmatrix_coopmt.BitmapFont(10,{'I': b'\xff\x03', 'L': b'\xff\x03\x00\x02\x00\x02', '?': b'\x01\x00'},spacing=2)
+        cases = [(None,0,0,'12:30'),(None,2,-2,'Hi!\nok?'),(None,13,25,'ABC\n%#'),(None,-3,5,'é'),(tall,3,1,'LIL'),(tall,-4,-3,'L?')]
+        for cls in (RGBMatrix,PackedRGBMatrix):
+            for font,row,col,string in cases:
+                glyphfont = font or rgbmatrix_coopmt.FONT_3X5
+                matrix,panel = make(cls=cls)
+                end = matrix.text(row,col,string,3,font)
+                expected = [[0] * 32 for i in range(16)]
+                step = (glyphfont.height + 7) // 8
+                top,left = row,col
+                for char in string:
+                    if char == '\n':
+                        top += glyphfont.height + 1
+                        left = col
+                        continue
+                    glyph = glyphfont.glyphs.get(char) or glyphfont.glyphs.get(char.upper()) or glyphfont.glyphs['?']
+                    columns = [int.from_bytes(glyph[i:i+step],'little') for i in range(0,len(glyph),step)]
+                    for c,bits in enumerate(columns):
+                        for r in range(glyphfont.height):
+                            if (bits >> r) & 1 and 0 <= top+r < 16 and 0 <= left+c < 32:
+                                expected[top+r][left+c] = 3
+                    left += len(columns) + glyphfont.spacing
+                self.assertEqual(pixels(matrix),expected,string)
+                self.assertEqual(end,left - glyphfont.spacing)
+
+                lines = string.split('\n')
+                widths = [sum(glyphfont.width(char) for char in line) + glyphfont.spacing * (len(line) - 1) for line in lines]
+                self.assertEqual(matrix.measure_text(string,font),(len(lines) * (glyphfont.height + 1) - 1,max(widths)))
+
+    def test_glyph_cache_eviction(self):
+        # Single span glyphs take 3 bytes of spans plus 16 bytes of overhead, three fit in the cache
+        font = rgbmatrix_coopmt.BitmapFont(5,{char: b'\x01' for char in 'ABCD?'},cacheSize=57)
+        spans = {char: font.spans(char) for char in 'ABC'}
+        self.assertEqual(list(font._cache),['A','B','C'])
+        font.spans('A')                     # now the most recently used
+        font.spans('D')
+        self.assertEqual(list(font._cache),['C','A','D'])
+        self.assertEqual(font._cached,57)
+        self.assertEqual(font.spans('B'),spans['B'])
+        self.assertEqual(list(font._cache),['A','D','B'])
+        self.assertTrue(font._cached <= font.cacheSize)
+
+    def test_scroll(self):
+        matrix,panel = make()
+        random_image(matrix)
+        before = pixels(matrix)
+        matrix.scroll(1,-2,wrap=True)
+        after = pixels(matrix)
+        for row in range(matrix.rows):
+            for col in range(matrix.cols):
+                self.assertEqual(after[(row+1) % matrix.rows][(col-2) % matrix.cols],before[row][col])
+
+    def test_scroll_matches_reference(self):
+        rand = random.Random(10)
+        modes = [(RGBMatrix,{}),(PackedRGBMatrix,{}),(RGBMatrix,{'colordepth':3})]
+        if rgbmatrix_coopmt.numpy is not None:
+            modes.append((RGBMatrix,{'numpyBuffer':True}))
+        for cls,kwargs in modes:
+            for trial in range(20):
+                drows,dcols = rand.randrange(-20,21),rand.randrange(-40,41)
+                wrap = rand.random() < 0.5
+                matrix,panel = make(cls=cls,**kwargs)
+                random_image(matrix,seed=trial)
+                before = pixels(matrix)
+                matrix.refresh()
+                matrix.clear_dirty()
+                matrix.scroll(drows,dcols,fill=2,wrap=wrap)
+                expected = [[2] * 32 for i in range(16)]
+                for row in range(16):
+                    for col in range(32):
+                        if wrap:
+                            expected[(row+drows) % 16][(col+dcols) % 32] = before[row][col]
+                        elif 0 <= row+drows < 16 and 0 <= col+dcols < 32:
+                            expected[row+drows][col+dcols] = before[row][col]
+                self.assertEqual(pixels(matrix),expected,(drows,dcols,wrap))
+                changed = {row for row in range(16) if before[row] != expected[row]}
+                self.assertTrue(changed <= set(matrix.dirty_rows()))
+                if 'colordepth' not in kwargs:
+                    matrix.refresh()
+                    self.assertEqual([list(row) for row in panel.leds],expected)
+
+class FileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self,name):
+        return os.path.join(self.directory.name,name)
+
+    def test_load_bmp_and_ppm(self):
+        rand = random.Random(4)
+        rows,cols = 9,21
+        image = [[(rand.choice((0,255)),rand.choice((0,255)),rand.choice((0,255))) for col in range(cols)] for row in range(rows)]
+        stride = (cols*3 + 3) // 4 * 4
+        data = b''.join(bytes(value for pixel in image[row] for value in pixel[::-1]).ljust(stride,b'\0')
+            for row in reversed(range(rows)))
+        header = struct.pack('<IiiHHIIiiII',40,cols,rows,1,24,0,0,0,0,0,0)
+        with open(self.path('image.bmp'),'wb') as f:
+            f.write(b'BM' + struct.pack('<IHHI',54+len(data),0,0,54) + header + data)
+        with open(self.path('image.ppm'),'wb') as f:
+            f.write(b'P6\n# test\n%d %d\n255\n' % (cols,rows) + bytes(value for row in image for pixel in row for value in pixel))
+
+        for name in ('image.bmp','image.ppm'):
+            for cls in (RGBMatrix,PackedRGBMatrix):
+                matrix,panel = make(cls=cls)
+                self.assertEqual(matrix.load_image(self.path(name),row=-2,col=5,srccol=1,width=15),(rows,cols))
+                for row in range(matrix.rows):
+                    for col in range(matrix.cols):
+                        srcrow = row + 2
+                        srccol = col - 5 + 1
+                        expected = 0
+                        if srcrow < rows and 1 <= srccol < 16:
+                            red,green,blue = image[srcrow][srccol]
+                            expected = matrix.color(red // 255,green // 255,blue // 255)
+                        self.assertEqual(matrix.value(row,col),expected)
+
+    def write_bmp(self,name,image,bpp,palette=None,topdown=False):
+        # image holds (red,green,blue) tuples for 24 bit files and palette indices otherwise
+        rows,cols = len(image),len(image[0])
+        stride = (cols*bpp + 31) // 32 * 4
+        data = b''
+        for line in (image if topdown else image[::-1]):
+            if bpp == 24:
+                packed = bytes(value for pixel in line for value in pixel[::-1])
+            else:
+                bits = 0
+                for index in line:
+                    bits = (bits << bpp) | index
+                length = (cols*bpp + 7) // 8
+                packed = (bits << (length*8 - cols*bpp)).to_bytes(length,'big')
+            data += packed.ljust(stride,b'\0')
+        colors = b''.join(bytes((blue,green,red,0)) for red,green,blue in palette or [])
+        header = struct.pack('<IiiHHIIiiII',40,cols,-rows if topdown else rows,1,bpp,0,0,0,0,len(palette or []),0)
+        with open(self.path(name),'wb') as f:
+            f.write(b'BM' + struct.pack('<IHHI',54+len(colors)+len(data),0,0,54+len(colors)) + header + colors + data)
+
+    def test_load_image_formats(self):
+        rand = random.Random(11)
+        rows,cols = 13,37
+        rgb = [[tuple(rand.randrange(256) for i in range(3)) for col in range(cols)] for row in range(rows)]
+        palette = [tuple(rand.randrange(256) for i in range(3)) for i in range(256)]
+        indices = [[rand.randrange(256) for col in range(cols)] for row in range(rows)]
+        gray = [[rand.randrange(16) for col in range(cols)] for row in range(rows)]
+
+        # Each file and the (red,green,blue,maxval) every pixel should be loaded as
+        files = {'24.bmp': lambda r,c: rgb[r][c] + (255,),'down.bmp': lambda r,c: rgb[r][c] + (255,),
+            'ppm.ppm': lambda r,c: rgb[r][c] + (255,),'pgm.pgm': lambda r,c: (gray[r][c],) * 3 + (15,),
+            'pbm.pbm': lambda r,c: (0,0,0,1) if indices[r][c] & 1 else (1,1,1,1)}
+        self.write_bmp('24.bmp',rgb,24)
+        self.write_bmp('down.bmp',rgb,24,topdown=True)
+        for bpp in (1,4,8):
+            mask = (1 << bpp) - 1
+            self.write_bmp(f'{bpp}.bmp',[[index & mask for index in line] for line in indices],bpp,palette[:mask+1])
+            files[f'{bpp}.bmp'] = lambda r,c,mask=mask: palette[indices[r][c] & mask] + (255,)
+        with open(self.path('ppm.ppm'),'wb') as f:
+            f.write(b'P6 %d %d 255\n' % (cols,rows) + bytes(value for line in rgb for pixel in line for value in pixel))
+        with open(self.path('pgm.pgm'),'wb') as f:
+            f.write(b'P5\n%d %d\n# comment\n15\n' % (cols,rows) + bytes(value for line in gray for value in line))
+        with open(self.path('pbm.pbm'),'wb') as f:
+            stride = (cols + 7) // 8
+            f.write(b'P4\n%d %d\n' % (cols,rows) + b''.join(
+                (int(''.join(str(index & 1) for index in line),2) << (stride*8 - cols)).to_bytes(stride,'big') for line in indices))
+
+        modes = [(RGBMatrix,{}),(PackedRGBMatrix,{}),(RGBMatrix,{'colordepth':2}),(RGBMatrix,{'colordepth':3})]
+        if rgbmatrix_coopmt.numpy is not None:
+            modes.append((RGBMatrix,{'numpyBuffer':True,'colordepth':3}))
+        for name,source in files.items():
+            for cls,kwargs in modes:
+                row,col = rand.randrange(-8,12),rand.randrange(-20,28)
+                srcrow,srccol = rand.randrange(4),rand.randrange(8)
+                height,width = rand.choice((None,rand.randrange(1,14))),rand.choice((None,rand.randrange(1,38)))
+                matrix,panel = make(cls=cls,**kwargs)
+                self.assertEqual(matrix.load_image(self.path(name),row,col,srcrow,srccol,height,width),(rows,cols))
+                top = (1 << matrix.colordepth) - 1
+                for r in range(16):
+                    for c in range(32):
+                        sr,sc = r - row + srcrow,c - col + srccol
+                        expected = 0
+                        if srcrow <= sr < min(rows,srcrow + (height or rows)) and srccol <= sc < min(cols,srccol + (width or cols)):
+                            *channels,maxval = source(sr,sc)
+                            expected = matrix.color(*(math.floor(Fraction(value*top,maxval) + Fraction(1,2)) for value in channels))
+                        self.assertEqual(matrix.value(r,c),expected,(name,kwargs,r,c))
+
+        with open(self.path('bad.gif'),'wb') as f:
+            f.write(b'GIF89a')
+        self.assertRaises(ValueError,make()[0].load_image,self.path('bad.gif'))
+
+    def test_animation_round_trip(self):
+        matrix,panel = make()
+        frames = []
+        for frame in range(5):
+            matrix.fill(0)
+            matrix.line(frame,0,15-frame,31,frame+1)
+            matrix.fill_rect(frame,frame,4,12,7)
+            frames.append([bytearray(row) for row in matrix._framebuffer])
+        filename = self.path('test.anim')
+        rgbmatrix_coopmt.Animation.encode(filename,iter(frames),0)
+
+        for cls in (RGBMatrix,PackedRGBMatrix):
+            matrix,panel = make(cls=cls)
+            animation = rgbmatrix_coopmt.Animation(filename,loop=False)
+            matrix.play(animation)
+            self.assertEqual(pixels(matrix),[list(row) for row in frames[0]])
+            for frame in range(1,5):
+                # Each refresh frame advances the animation before the panel is refreshed
+                matrix.refresh()
+                self.assertEqual(pixels(matrix),[list(row) for row in frames[frame]])
+                self.assertEqual([list(row) for row in panel.leds],[list(row) for row in frames[frame]])
+            matrix.refresh()
+            self.assertTrue(animation.done)
+            self.assertEqual(pixels(matrix),[list(row) for row in frames[4]])
+            animation.close()
+
+    def test_animation_loops_clipped(self):
+        rand = random.Random(12)
+        for colordepth,typecode in ((1,'B'),(3,'H')):
+            colors = 1 << (3 * colordepth)
+            # Frames mixing single color runs, literal pixels and unchanged areas
+            frames = [[array(typecode,[rand.randrange(colors)] * 10) for row in range(6)]]
+            for frame in range(5):
+                image = [array(typecode,row) for row in frames[-1]]
+                for i in range(rand.randrange(1,12)):
+                    row,col = rand.randrange(6),rand.randrange(10)
+                    count = len(image[row][col:col+rand.randrange(1,10)])
+                    image[row][col:col+count] = array(typecode,[rand.randrange(colors)] * count)
+                frames.append(image)
+            filename = self.path(f'{colordepth}.anim')
+            rgbmatrix_coopmt.Animation.encode(filename,frames,0)
+
+            placements = ((-2,27),(12,-4))
+            matrix,panel = make(colordepth=colordepth)
+            random_image(matrix,colors=colors)
+            background = pixels(matrix)
+            animations = [rgbmatrix_coopmt.Animation(filename,row,col) for row,col in placements]
+            for animation in animations:
+                matrix.play(animation)
+            for step in range(2 * len(frames) + 2):
+                expected = [list(row) for row in background]
+                for animation,(row,col) in zip(animations,placements):
+                    self.assertEqual(animation.frame,step % len(frames))
+                    for r in range(6):
+                        for c in range(10):
+                            if 0 <= row+r < 16 and 0 <= col+c < 32:
+                                expected[row+r][col+c] = frames[step % len(frames)][r][c]
+                self.assertEqual(pixels(matrix),expected,step)
+                matrix.refresh()
+
+            # A stopped animation stays on its current frame
+            matrix.stop_animation(animations[0])
+            shown = animations[0].frame
+            matrix.refresh()
+            self.assertEqual(animations[0].frame,shown)
+            self.assertEqual(animations[1].frame,(shown + 1) % len(frames))
+            matrix.stop_animation()
+            self.assertEqual(matrix._animations,[])
+            for animation in animations:
+                animation.close()
+
+    def test_animation_durations(self):
+        filename = self.path('slow.anim')
+        frames = [[bytearray([frame] * 32)] * 16 for frame in range(3)]
+        rgbmatrix_coopmt.Animation.encode(filename,frames,[0,60000,0])
+        matrix,panel = make()
+        animation = rgbmatrix_coopmt.Animation(filename)
+        matrix.play(animation)
+        for i in range(3):
+            matrix.refresh()
+            self.assertEqual(animation.frame,1)     # the second frame is shown for a minute
+        self.assertEqual(matrix.value(5,5),1)
+        animation.close()
+        with open(self.path('bad.anim'),'wb') as f:
+            f.write(b'\0' * 16)
+        self.assertRaises(ValueError,rgbmatrix_coopmt.Animation,self.path('bad.anim'))
+
+    def test_animation_rejects_double_buffering(self):
+        filename = self.path('test.anim')
+        rgbmatrix_coopmt.Animation.encode(filename,[[bytearray(32)] * 16],100)
+        matrix,panel = make()
+        animation = rgbmatrix_coopmt.Animation(filename)
+        matrix.begin_frame()
+        self.assertRaises(RuntimeError,matrix.play,animation)
+        other,panel = make()
+        other.play(animation)
+        self.assertRaises(RuntimeError,other.begin_frame)
+        animation.close()
+
+if __name__ == '__main__':
+    unittest.main()
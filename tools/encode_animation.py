@@ -0,0 +1,60 @@
+"""
+Animation encoder for rgbmatrix_coopmt
+====================================================
+
+Converts a sequence of image files (BMP, PBM, PGM or PPM) into an animation file which can be
+copied to the board and played with rgbmatrix_coopmt.Animation and RGBMatrix.play(). Each image
+is loaded with RGBMatrix.load_image() on a SimulatedPanel so the colors are quantized exactly as
+they would be on the board.
+
+Run from the repository root with CPython:
+
+    python tools/encode_animation.py --rows 32 --cols 64 [--colordepth 1] [--duration 100]
+        --output spin.anim frame000.bmp frame001.bmp ...
+"""
+
+import argparse
+from array import array
+import os
+import sys
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import rgbmatrix_coopmt
+
+RGBPINS = ["R1","G1","B1","R2","G2","B2"]
+
+def make_matrix(rows,cols,colordepth):
+    # The panel needs a power of 2 rows, an animation of any size is taken from its top rows
+    panelRows = 4
+    while panelRows < rows:
+        panelRows *= 2
+    panel = rgbmatrix_coopmt.SimulatedPanel(panelRows,cols)
+    addrPins = ["A","B","C","D","E","F"][:len(bin(panelRows))-4]
+    return rgbmatrix_coopmt.RGBMatrix(panelRows,cols,addrPins,RGBPINS,"CLK","LAT","OE",backend=panel,
+        colordepth=colordepth)
+
+def load_frames(matrix,filenames,rows):
+    # One framebuffer at a time, the encoder only keeps the first and the previous frame
+    typecode = 'H' if 3 * matrix.colordepth > 8 else 'B'
+    for filename in filenames:
+        matrix.fill(0)
+        matrix.load_image(filename)
+        yield [array(typecode,[matrix.value(row,col) for col in range(matrix.cols)]) for row in range(rows)]
+
+def main():
+    parser = argparse.ArgumentParser(description='Encode image files into an rgbmatrix_coopmt animation')
+    parser.add_argument('images',nargs='+',help='the frames of the animation in order')
+    parser.add_argument('--rows',type=int,required=True,help='rows of the animation')
+    parser.add_argument('--cols',type=int,required=True,help='columns of the animation')
+    parser.add_argument('--colordepth',type=int,default=1,help='RGBMatrix colordepth (default: %(default)s)')
+    parser.add_argument('--duration',type=int,default=100,help='milliseconds each frame is shown (default: %(default)s)')
+    parser.add_argument('--output',required=True,help='the animation file to write')
+    args = parser.parse_args()
+
+    matrix = make_matrix(args.rows,args.cols,args.colordepth)
+    rgbmatrix_coopmt.Animation.encode(args.output,load_frames(matrix,args.images,args.rows),args.duration)
+    matrix.deinit()
+    print(f'{len(args.images)} frames, {os.path.getsize(args.output)} bytes',file=sys.stderr)
+
+if __name__ == '__main__':
+    main()